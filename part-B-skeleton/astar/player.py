@@ -1,7 +1,13 @@
 from collections import defaultdict
 import math
+import time
 import numpy as np
 
+from enchanted_hamsters.bitboard import Board
+from enchanted_hamsters.geometry import HEXES, PLAYER_LIST, WINNING_EXITS
+from enchanted_hamsters.race import RaceSolver, in_race
+from enchanted_hamsters.tablebase import load_tablebase
+
     # coordinate indexes
 X = 0
 Y = 1
@@ -37,6 +43,9 @@ BLUE_STARTS = [(0, 3), (1, 2), (2, 1), (3, 0)]
 # temporary holding place for exiting pieces
 EXIT_LOC = (3, 1)
 
+# CPU seconds the race solver may spend on a turn before a* takes over
+RACE_SECONDS = 0.5
+
 class ExamplePlayer:
     def __init__(self, colour):
         """
@@ -68,6 +77,9 @@ class ExamplePlayer:
         else:
             # PLAYER_TYPE = "blue"
             self.exits = BLUE_EXITS
+        self.exits_made = 0
+        # solves the end of the game exactly once nobody can get in the way
+        self.race_solver = RaceSolver(load_tablebase())
 
 
 
@@ -84,6 +96,9 @@ class ExamplePlayer:
         """
         if (len(self.pieces) == 0):
             return ("PASS", None)
+        race_move = self.race_action()
+        if race_move:
+            return race_move
         goal = self.generate_goal()
         searched = self.a_star(self.board, goal)
         if (searched):
@@ -127,10 +142,26 @@ class ExamplePlayer:
         elif action[0] == 'EXIT':
             coord = action[1]
             self.updated_board = self.make_exit(coord, self.updated_board)
+            if colour == self.colour:
+                self.exits_made += 1
         self.board = dict(self.updated_board)
         self.pieces = self.updatePieces(self.updated_board)
         print("SELF.PIECES: ",self.colour, self.pieces,"\n\n")
     
+    # plays the fastest way to the exits once every piece has passed the enemy pieces
+    def race_action(self):
+        state = Board.from_dict(self.board)
+        colour = PLAYER_LIST.index(self.colour)
+        if not in_race(state, colour):
+            return None
+        deadline = time.process_time() + RACE_SECONDS
+        move = self.race_solver.best_move(state, colour, WINNING_EXITS - self.exits_made, deadline)
+        if move is None:
+            return None
+        if move[0] == "EXIT":
+            return self.print_move(HEXES[move[1]])
+        return self.print_move(HEXES[move[1]], HEXES[move[2]])
+
     # uses a heuristic function to return a value for the given state
     def heuristic(self, state):
         state_val = 0
@@ -1 +1,2 @@
-from enchanted_hamsters.player import ExamplePlayer as Player
\ No newline at end of file
+from enchanted_hamsters.player import ExamplePlayer as Player
+from enchanted_hamsters.player import ParanoidPlayer, BRSPlayer, PonderingPlayer
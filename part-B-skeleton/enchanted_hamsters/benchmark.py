@@ -0,0 +1,192 @@
+"""
+Benchmark for the enchanted_hamsters search modes.
+
+Searches the same set of positions with each search mode, giving every
+position the same CPU time, and reports how deep iterative deepening got, how
+many nodes per second it searched, and (for the alpha-beta modes) how often a
+cutoff came from the first move searched. The Monte Carlo Tree Search player
+of mcts_hamsters is given the same positions, and its playouts per second are
+reported. The positions are reached by seeded random play from the start of
+the game, so runs are comparable.
+
+With -p, it instead counts the positions at each depth of the full game tree
+from the start (perft), which checks move generation and measures its speed.
+
+Run from the part-B-skeleton directory with:
+    python -m enchanted_hamsters.benchmark [-t SECONDS] [-n POSITIONS] [-p DEPTH]
+"""
+import argparse
+import random
+import time
+
+from enchanted_hamsters.geometry import PLAYER_LIST, WINNING_EXITS
+from enchanted_hamsters.player import BRSPlayer, ExamplePlayer, ParanoidPlayer
+from mcts_hamsters.player import ExamplePlayer as MCTSPlayer
+
+
+class BatchedMaxnPlayer(ExamplePlayer):
+    """
+    maxn with the frontier leaves evaluated together by batch_evaluation.
+    """
+    BATCH_LEAVES = True
+
+
+SEARCH_MODES = [
+    ('maxn', ExamplePlayer),
+    ('maxn-batch', BatchedMaxnPlayer),
+    ('paranoid', ParanoidPlayer),
+    ('brs', BRSPlayer),
+]
+
+DEFAULT_SECONDS = 1.0
+DEFAULT_POSITIONS = 10
+DEFAULT_SEED = 30024
+
+# sampled positions are taken from this range of plies into a random game
+MIN_PLIES = 6
+MAX_PLIES = 60
+
+
+def sample_positions(count, seed):
+    """
+    Builds a list of positions by playing random actions from the start.
+    :param count: the number of positions to build
+    :param seed: the seed for the random actions
+    :return: a list of (board, exits, colour index to move) tuples
+    """
+    rng = random.Random(seed)
+    rules = ExamplePlayer(PLAYER_LIST[0])
+    positions = []
+    while len(positions) < count:
+        board = rules.createBoard()
+        exits = [0, 0, 0]
+        plies = rng.randint(MIN_PLIES, MAX_PLIES)
+        for ply in range(plies):
+            colour = ply % len(PLAYER_LIST)
+            move = rng.choice(rules.generate_moves(board, colour))
+            rules.make_move(board, colour, move, exits)
+            if max(exits) >= WINNING_EXITS:
+                break
+        colour = plies % len(PLAYER_LIST)
+        # skip finished games and positions with nothing to decide
+        if max(exits) < WINNING_EXITS and len(rules.generate_moves(board, colour)) > 1:
+            positions.append((board, exits, colour))
+    return positions
+
+
+def run_mode(player_class, positions, seconds):
+    """
+    Searches every position with one player class.
+    :param player_class: the ExamplePlayer class (or subclass) to search with
+    :param positions: the positions from sample_positions
+    :param seconds: the CPU time to give each position
+    :return: a list of (depth completed, nodes searched, CPU seconds used,
+    cutoffs, first move cutoffs) tuples
+    """
+    results = []
+    for board, exits, colour in positions:
+        player = player_class(PLAYER_LIST[colour])
+        player.board = board.copy()
+        player.numexits = list(exits)
+        start = time.process_time()
+        player.iterative_deepening(start + seconds)
+        results.append((player.completed_depth, player.nodes, time.process_time() - start,
+                        player.orderer.cutoffs, player.orderer.first_move_cutoffs))
+    return results
+
+
+def run_mcts(positions, seconds):
+    """
+    Searches every position with the MCTS player.
+    :param positions: the positions from sample_positions
+    :param seconds: the CPU time to give each position
+    :return: a list of (iterations, playouts, CPU seconds searching) tuples
+    """
+    results = []
+    for board, exits, colour in positions:
+        player = MCTSPlayer(PLAYER_LIST[colour])
+        player.board = board.copy()
+        player.numexits = list(exits)
+        player.mcts(time.process_time() + seconds)
+        results.append((player.iterations, player.playouts, player.search_seconds))
+    return results
+
+
+def perft(rules, state, colour, depth, exits):
+    """
+    Counts the leaves of the full game tree below a position.
+    :param rules: the ExamplePlayer whose move generation is counted
+    :param state: the board state, which is modified and restored
+    :param colour: the colour index of the player to move
+    :param depth: the number of plies to expand
+    :param exits: the list of exits made, which is modified and restored
+    :return: the number of positions depth plies below this one
+    """
+    if depth == 0 or max(exits) >= WINNING_EXITS:
+        return 1
+    # every action leads to exactly one leaf, so the last ply is only counted
+    if depth == 1:
+        return len(rules.generate_moves(state, colour))
+    leaves = 0
+    next_colour = (colour + 1) % len(PLAYER_LIST)
+    for move in rules.generate_moves(state, colour):
+        undo = rules.make_move(state, colour, move, exits)
+        leaves += perft(rules, state, next_colour, depth - 1, exits)
+        rules.unmake_move(state, colour, move, exits, undo)
+    return leaves
+
+
+def run_perft(depth):
+    """
+    Prints perft counts and speeds from the start of the game.
+    :param depth: the deepest number of plies to count
+    """
+    rules = ExamplePlayer(PLAYER_LIST[0])
+    print(f"{'depth':>5s} {'leaves':>10s} {'leaves/s':>10s}")
+    for plies in range(1, depth + 1):
+        start = time.process_time()
+        leaves = perft(rules, rules.createBoard(), 0, plies, [0, 0, 0])
+        elapsed = time.process_time() - start
+        print(f"{plies:5d} {leaves:10d} {leaves / max(elapsed, 1e-9):10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="compare enchanted_hamsters search modes")
+    parser.add_argument('-t', '--time', type=float, default=DEFAULT_SECONDS,
+                        help="CPU seconds to search each position")
+    parser.add_argument('-n', '--positions', type=int, default=DEFAULT_POSITIONS,
+                        help="number of positions to search")
+    parser.add_argument('-s', '--seed', type=int, default=DEFAULT_SEED,
+                        help="seed used to build the positions")
+    parser.add_argument('-p', '--perft', type=int, default=0,
+                        help="count the game tree from the start to this depth instead")
+    args = parser.parse_args()
+    if args.perft:
+        run_perft(args.perft)
+        return
+
+    positions = sample_positions(args.positions, args.seed)
+    print(f"{len(positions)} positions, {args.time:.2f}s CPU each")
+    print(f"{'mode':10s} {'mean depth':>10s} {'max depth':>10s} {'nodes/s':>10s} "
+          f"{'first cut':>10s}")
+    for name, player_class in SEARCH_MODES:
+        results = run_mode(player_class, positions, args.time)
+        depths = [result[0] for result in results]
+        nodes = sum(result[1] for result in results)
+        elapsed = sum(result[2] for result in results)
+        cutoffs = sum(result[3] for result in results)
+        first_cutoffs = sum(result[4] for result in results)
+        first_rate = first_cutoffs / cutoffs if cutoffs else 0.0
+        print(f"{name:10s} {sum(depths) / len(depths):10.2f} {max(depths):10d} "
+              f"{nodes / elapsed:10.0f} {first_rate:10.1%}")
+
+    results = run_mcts(positions, args.time)
+    iterations = sum(result[0] for result in results)
+    playouts = sum(result[1] for result in results)
+    elapsed = sum(result[2] for result in results)
+    print(f"{'mode':10s} {'iterations':>10s} {'playouts/s':>10s}")
+    print(f"{'mcts':10s} {iterations / len(results):10.0f} {playouts / elapsed:10.0f}")
+
+
+if __name__ == '__main__':
+    main()
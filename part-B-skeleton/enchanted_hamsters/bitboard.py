@@ -0,0 +1,354 @@
+"""
+Compact board representation for the enchanted_hamsters engine.
+
+Each of the 37 hexes is given a bit position (in the same order the referee
+numbers its display cells), and a board is stored as one integer mask per
+colour. Copying a board copies three ints, and emptiness, ownership and
+piece counts are answered with a couple of bitwise operations.
+
+Colours are referred to by their index into PLAYER_LIST throughout this
+module, so that the masks can be kept in a plain list.
+
+Every board also carries its Zobrist key (see zobrist.py) and an evaluation
+state: per colour, the number of pieces, the summed distance of those pieces
+to their nearest exits, and the number of (piece, adjacent enemy piece)
+pairs. All of these are updated as deltas by the methods that change the
+board, so reading them costs nothing.
+
+Which spaces each colour could jump over is worked out at most once per
+position, the first time it is asked for, as a ThreatMap that capture
+generation and exchange evaluation (and so move ordering) both read.
+"""
+
+from enchanted_hamsters.geometry import (
+    EXIT_DISTANCES, EXIT_MASKS, HEX_INDEX, HEXES, MOVE_RAYS, MOVE_RING_MASKS, NEIGHBOUR_MASKS,
+    NUM_HEXES, PLAYER_LIST, START_MASKS)
+from enchanted_hamsters.zobrist import PIECE_KEYS, exit_key, exit_step_key
+
+
+# for each space, the move targets of a piece on it, keyed by the occupancy of
+# the space's MOVE_RING_MASKS; filled in as patterns are first met, since
+# only a small part of the 2^12 patterns of each space ever occur; the same
+# again as action tuples
+MOVE_PATTERNS = [{} for index in range(NUM_HEXES)]
+ACTION_PATTERNS = [{} for index in range(NUM_HEXES)]
+
+
+def popcount(mask):
+    """
+    Counts the set bits of a mask
+    :param mask: a non-negative integer
+    :return: the number of bits set
+    """
+    return bin(mask).count("1")
+
+
+def mask_indices(mask):
+    """
+    Lists the bit positions set in a mask
+    :param mask: a non-negative integer
+    :return: a list of hex indices, lowest first
+    """
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
+
+
+def pattern_targets(index, occupied):
+    """
+    Works out the spaces a piece can move or jump to.
+    :param index: the hex index of the piece
+    :param occupied: the mask of occupied spaces
+    :return: a tuple of (target index, jumped index) pairs, where the jumped
+    index is None for a plain move
+    """
+    targets = []
+    for adjacent, landing in MOVE_RAYS[index]:
+        if not (occupied >> adjacent) & 1:
+            targets.append((adjacent, None))
+        elif landing is not None and not (occupied >> landing) & 1:
+            targets.append((landing, adjacent))
+    return tuple(targets)
+
+
+class ThreatMap:
+    """
+    The jumps each colour has in one position. over[colour] is the mask of
+    spaces the colour has a piece next to with the space beyond empty, so
+    that a piece standing there could be jumped (whether or not one does).
+    """
+    __slots__ = ('over',)
+
+    def __init__(self, masks):
+        """
+        :param masks: the masks of each colour's pieces
+        """
+        occupied = masks[0] | masks[1] | masks[2]
+        self.over = []
+        for mask in masks:
+            over = 0
+            for index in mask_indices(mask):
+                for adjacent, landing in MOVE_RAYS[index]:
+                    if landing is not None and not (occupied >> landing) & 1:
+                        over |= 1 << adjacent
+            self.over.append(over)
+
+    def exposed(self, colour):
+        """
+        The spaces on which a piece of a colour could be jumped by another colour.
+        :param colour: the colour index of the piece
+        """
+        over = self.over
+        return over[(colour + 1) % 3] | over[(colour + 2) % 3]
+
+
+class Board:
+    """
+    A Chexers board as three occupancy masks, one per colour, the Zobrist
+    key of the pieces and exit counts, and the per-colour evaluation state
+    (counts, dist_sums and threats).
+    """
+    __slots__ = ('masks', 'key', 'counts', 'dist_sums', 'threats', 'jumps')
+
+    def __init__(self, masks=(0, 0, 0), key=None):
+        self.masks = list(masks)
+        if key is None:
+            key = self.full_key([0, 0, 0])
+        self.key = key
+        self.recount()
+        self.jumps = None
+
+    def recount(self):
+        """
+        Computes the evaluation state of the board from scratch.
+        """
+        masks = self.masks
+        self.counts = [popcount(mask) for mask in masks]
+        self.dist_sums = [sum(EXIT_DISTANCES[colour][index] for index in mask_indices(mask))
+                          for colour, mask in enumerate(masks)]
+        occupied = self.occupied()
+        self.threats = [sum(popcount(NEIGHBOUR_MASKS[index] & occupied & ~mask)
+                            for index in mask_indices(mask)) for mask in masks]
+
+    def full_key(self, exits):
+        """
+        Computes the Zobrist key of the board from scratch.
+        :param exits: the list of exits made by each colour
+        :return: the 64-bit key, not including the side to move
+        """
+        key = exit_key(exits)
+        for colour, mask in enumerate(self.masks):
+            for index in mask_indices(mask):
+                key ^= PIECE_KEYS[colour][index]
+        return key
+
+    @classmethod
+    def initial(cls):
+        """
+        Creates the board at the start of a game.
+        """
+        return cls(START_MASKS)
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Converts a {(q, r): colour} dictionary into a board.
+        :param state: the dictionary board state
+        :return: the equivalent board
+        """
+        masks = [0, 0, 0]
+        for coord, colour in state.items():
+            masks[PLAYER_LIST.index(colour)] |= 1 << HEX_INDEX[coord]
+        return cls(masks)
+
+    def to_dict(self):
+        """
+        Converts the board back into a {(q, r): colour} dictionary.
+        """
+        state = {}
+        for colour, mask in enumerate(self.masks):
+            for index in mask_indices(mask):
+                state[HEXES[index]] = PLAYER_LIST[colour]
+        return state
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.masks = list(self.masks)
+        board.key = self.key
+        board.counts = list(self.counts)
+        board.dist_sums = list(self.dist_sums)
+        board.threats = list(self.threats)
+        board.jumps = self.jumps
+        return board
+
+    def __eq__(self, other):
+        return isinstance(other, Board) and self.masks == other.masks
+
+    def __hash__(self):
+        return hash(tuple(self.masks))
+
+    def __repr__(self):
+        return "Board({!r})".format(self.to_dict())
+
+    def threat_map(self):
+        """
+        The ThreatMap of the position, worked out the first time it is needed.
+        """
+        if self.jumps is None:
+            self.jumps = ThreatMap(self.masks)
+        return self.jumps
+
+    def occupied(self):
+        """
+        The mask of all spaces holding a piece of any colour.
+        """
+        masks = self.masks
+        return masks[0] | masks[1] | masks[2]
+
+    def is_empty(self, index):
+        """
+        Determines if a space has no piece on it.
+        :param index: the hex index of the space
+        :return: True if no piece occupies the space
+        """
+        return not (self.occupied() >> index) & 1
+
+    def owner(self, index):
+        """
+        Finds the colour of the piece on a space.
+        :param index: the hex index of the space
+        :return: the colour index of the piece, or None if the space is empty
+        """
+        bit = 1 << index
+        for colour in range(len(PLAYER_LIST)):
+            if self.masks[colour] & bit:
+                return colour
+        return None
+
+    def count(self, colour):
+        """
+        Finds the number of pieces a player has on the board.
+        :param colour: the colour index of the player
+        :return: the number of pieces
+        """
+        return self.counts[colour]
+
+    def pieces(self, colour):
+        """
+        Lists the hex indices of a player's pieces.
+        :param colour: the colour index of the player
+        """
+        return mask_indices(self.masks[colour])
+
+    def can_exit(self, colour, index):
+        """
+        Determines if a piece of the given colour is standing on one of its exits.
+        :param colour: the colour index of the piece
+        :param index: the hex index of the piece
+        """
+        return bool((EXIT_MASKS[colour] & self.masks[colour]) >> index & 1)
+
+    def exits(self, colour):
+        """
+        Lists the pieces of a player that are able to exit.
+        :param colour: the colour index of the player
+        """
+        return mask_indices(EXIT_MASKS[colour] & self.masks[colour])
+
+    def move_targets(self, index):
+        """
+        Finds the spaces a piece can move or jump to.
+        :param index: the hex index of the piece
+        :return: a tuple of (target index, jumped index) pairs, where the jumped
+        index is None for a plain move; it is shared, and must not be modified
+        """
+        masks = self.masks
+        pattern = (masks[0] | masks[1] | masks[2]) & MOVE_RING_MASKS[index]
+        patterns = MOVE_PATTERNS[index]
+        targets = patterns.get(pattern)
+        if targets is None:
+            targets = patterns[pattern] = pattern_targets(index, pattern)
+        return targets
+
+    def move_actions(self, index):
+        """
+        Finds the moves and jumps a piece can make.
+        :param index: the hex index of the piece
+        :return: a tuple of ("MOVE" or "JUMP", old index, new index, jumped
+        index) tuples; it is shared, and must not be modified
+        """
+        masks = self.masks
+        pattern = (masks[0] | masks[1] | masks[2]) & MOVE_RING_MASKS[index]
+        patterns = ACTION_PATTERNS[index]
+        actions = patterns.get(pattern)
+        if actions is None:
+            actions = patterns[pattern] = tuple(
+                ("MOVE", index, target, None) if jumped is None else ("JUMP", index, target, jumped)
+                for target, jumped in self.move_targets(index))
+        return actions
+
+    def place(self, index, colour):
+        """
+        Puts a piece on an empty space.
+        :param index: the hex index of the space
+        :param colour: the colour index of the piece
+        """
+        masks = self.masks
+        masks[colour] |= 1 << index
+        self.jumps = None
+        self.key ^= PIECE_KEYS[colour][index]
+        self.counts[colour] += 1
+        self.dist_sums[colour] += EXIT_DISTANCES[colour][index]
+        # every adjacent enemy pair the piece forms counts for both colours
+        neighbours = NEIGHBOUR_MASKS[index]
+        threats = self.threats
+        for other in range(3):
+            if other != colour and neighbours & masks[other]:
+                pairs = popcount(neighbours & masks[other])
+                threats[other] += pairs
+                threats[colour] += pairs
+
+    def remove(self, index, colour):
+        """
+        Takes a piece off the board.
+        :param index: the hex index of the piece
+        :param colour: the colour index of the piece
+        """
+        masks = self.masks
+        masks[colour] &= ~(1 << index)
+        self.jumps = None
+        self.key ^= PIECE_KEYS[colour][index]
+        self.counts[colour] -= 1
+        self.dist_sums[colour] -= EXIT_DISTANCES[colour][index]
+        neighbours = NEIGHBOUR_MASKS[index]
+        threats = self.threats
+        for other in range(3):
+            if other != colour and neighbours & masks[other]:
+                pairs = popcount(neighbours & masks[other])
+                threats[other] -= pairs
+                threats[colour] -= pairs
+
+    def record_exit(self, colour, count):
+        """
+        Updates the key for a colour's exit count changing between count and
+        count + 1 (in either direction).
+        :param colour: the colour index of the exiting player
+        :param count: the lower of the two exit counts
+        """
+        self.key ^= exit_step_key(colour, count)
+
+    def set_owner(self, index, colour):
+        """
+        Changes the colour of the piece on a space.
+        :param index: the hex index of the piece
+        :param colour: the new colour index of the piece
+        :return: the colour index the piece had before
+        """
+        previous = self.owner(index)
+        if previous != colour:
+            self.remove(index, previous)
+            self.place(index, colour)
+        return previous
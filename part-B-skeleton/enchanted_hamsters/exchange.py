@@ -0,0 +1,101 @@
+"""
+Static exchange evaluation of captures.
+
+A capture converts the jumped piece to the capturer's colour, but the
+converted piece stays where it was, next to whatever could reach it before.
+If an enemy can jump it in turn, it is converted again, and the exchange can
+go on for several captures on the same space. Searching every one of them
+costs nodes; the static exchange evaluator plays the exchange out on the
+masks alone instead.
+
+The capturing colour is one side and every other colour the other side, as
+in the paranoid search. The sides take turns capturing on the target space
+(any piece of the side that can jump it may), and either side may stop
+whenever continuing would leave it worse off. The result is the number of
+pieces the capturing colour gains from the exchange: 1 when the converted
+piece is safe, 0 when the other side wins it back.
+
+Pieces can jump back and forth over the same space, so an exchange can come
+back to a position it has already been in and go round forever. Neither side
+ever keeps the piece for good in such a cycle, and the other side can always
+take it back, so the piece is scored as not safe, whoever captured last.
+"""
+from enchanted_hamsters.geometry import CAPTURE_RAYS
+
+# the longest exchange played out; one that has not settled by then is scored
+# like a cycle
+MAX_EXCHANGE_CAPTURES = 8
+
+
+def find_capturer(masks, target, owner, own_side, colour):
+    """
+    Finds a piece that can jump a target piece.
+    :param masks: the masks of each colour's pieces
+    :param target: the hex index of the target piece
+    :param owner: the colour index of the target piece
+    :param own_side: True to look for the capturing colour's pieces, False
+    for any other colour's
+    :param colour: the colour index that made the first capture
+    :return: a (colour index, start index, landing index) tuple, or None
+    """
+    occupied = masks[0] | masks[1] | masks[2]
+    for start, landing in CAPTURE_RAYS[target]:
+        if (occupied >> landing) & 1 or not (occupied >> start) & 1:
+            continue
+        for capturer, mask in enumerate(masks):
+            if (mask >> start) & 1:
+                if capturer != owner and (capturer == colour) == own_side:
+                    return capturer, start, landing
+                break
+    return None
+
+
+def static_exchange(state, colour, move):
+    """
+    Plays out the exchange a capture starts on the space it jumps.
+    :param state: the board state before the capture
+    :param colour: the colour index of the capturing player
+    :param move: a ("JUMP", old index, new index, jumped index) capture tuple
+    :return: the pieces the capturing colour gains once neither side wants
+    to capture any more, or 0 if the exchange goes round in a cycle
+    """
+    old_index, new_index, target = move[1], move[2], move[3]
+    # the capture neither opens nor closes a jump over the target for the
+    # other colours, so most exchanges end before they start
+    if not (state.threat_map().exposed(colour) >> target) & 1:
+        return 1
+    masks = list(state.masks)
+    owner = next(other for other, mask in enumerate(masks) if (mask >> target) & 1)
+    # the positions met so far; the masks also say whose turn it is to
+    # capture, since that is the side that does not own the target
+    seen = {tuple(masks)}
+    # the capturing colour's piece count after each capture
+    balances = []
+    balance = 0
+    capturer, start, landing = colour, old_index, new_index
+    while True:
+        masks[capturer] ^= 1 << start | 1 << landing
+        masks[owner] ^= 1 << target
+        masks[capturer] |= 1 << target
+        balance += 1 if capturer == colour else -1
+        balances.append(balance)
+        owner = capturer
+        position = tuple(masks)
+        if position in seen or len(balances) >= MAX_EXCHANGE_CAPTURES:
+            # the exchange never settles, so the piece is not safe
+            return 0
+        seen.add(position)
+        found = find_capturer(masks, target, owner, owner != colour, colour)
+        if found is None:
+            break
+        capturer, start, landing = found
+    # work back from the end: each side only makes its capture if that
+    # leaves it better off than stopping before it
+    value = balances[-1]
+    for capture in range(len(balances) - 2, -1, -1):
+        if capture % 2 == 0:
+            # the other side makes the next capture
+            value = min(balances[capture], value)
+        else:
+            value = max(balances[capture], value)
+    return value
@@ -0,0 +1,109 @@
+"""
+Board geometry shared by the enchanted_hamsters modules: the hexes in bit
+order, the start and exit spaces of each colour, and lookup tables that are
+computed once at import time so that the search never has to do coordinate
+arithmetic.
+"""
+
+# coordinate indexes
+X = 0
+Y = 1
+
+BOARD_EDGE = 3
+
+PLAYER_LIST = ['red', 'green', 'blue']
+
+# exits a colour needs to win
+WINNING_EXITS = 4
+
+RED_EXITS = [(3, -3), (3, -2), (3, -1), (3, 0)]
+GREEN_EXITS = [(-3, 3), (-2, 3), (-1, 3), (0, 3)]
+BLUE_EXITS = [(0, -3), (-1, -2), (-2, -1), (-3, 0)]
+
+RED_STARTS = [(-3, 0), (-3, 1), (-3, 2), (-3, 3)]
+GREEN_STARTS = [(0, -3), (1, -3), (2, -3), (3, -3)]
+BLUE_STARTS = [(0, 3), (1, 2), (2, 1), (3, 0)]
+
+# offsets to the six adjacent spaces, in direction order (E, NE, SE, W, SW, NW)
+ADJACENT_STEPS = [(1, 0), (1, -1), (0, 1), (-1, 0), (-1, 1), (0, -1)]
+
+# every space on the board, in bit order
+HEXES = [(q, r) for q in range(-BOARD_EDGE, BOARD_EDGE + 1)
+         for r in range(-BOARD_EDGE, BOARD_EDGE + 1)
+         if abs(-q - r) <= BOARD_EDGE]
+HEX_INDEX = {coord: index for index, coord in enumerate(HEXES)}
+NUM_HEXES = len(HEXES)
+
+
+def coords_mask(coords):
+    """
+    Builds a mask with the bits of the given spaces set
+    :param coords: an iterable of (q, r) coordinates
+    :return: the integer mask
+    """
+    mask = 0
+    for coord in coords:
+        mask |= 1 << HEX_INDEX[coord]
+    return mask
+
+
+EXIT_MASKS = [coords_mask(RED_EXITS), coords_mask(GREEN_EXITS), coords_mask(BLUE_EXITS)]
+START_MASKS = [coords_mask(RED_STARTS), coords_mask(GREEN_STARTS), coords_mask(BLUE_STARTS)]
+
+
+def hex_distance(coord1, coord2):
+    """
+    Calculates the number of spaces to traverse between two spaces
+    :param coord1: a tuple containing an x and y coordinate
+    :param coord2: a second tuple containing an x and y coordinate
+    """
+    dx = coord2[X] - coord1[X]
+    dy = coord2[Y] - coord1[Y]
+    return (abs(dx) + abs(dy) + abs(dx + dy)) // 2
+
+
+# for each space and direction, the index of the adjacent space and of the
+# space a jump lands on (None where that is off the board)
+NEIGHBOUR_TABLE = [[HEX_INDEX.get((q + dq, r + dr)) for dq, dr in ADJACENT_STEPS]
+                   for q, r in HEXES]
+JUMP_TABLE = [[HEX_INDEX.get((q + 2 * dq, r + 2 * dr)) for dq, dr in ADJACENT_STEPS]
+              for q, r in HEXES]
+
+# for each space, an (adjacent index, landing index) pair per direction that
+# stays on the board, which is all that move generation needs
+MOVE_RAYS = [[(adjacent, landing) for adjacent, landing in zip(NEIGHBOUR_TABLE[index], JUMP_TABLE[index])
+              if adjacent is not None] for index in range(NUM_HEXES)]
+
+# for each space, the mask of the spaces that decide where a piece on it can
+# move or jump: the adjacent ring and the jump ring around it
+MOVE_RING_MASKS = [sum(1 << adjacent | (0 if landing is None else 1 << landing)
+                       for adjacent, landing in MOVE_RAYS[index]) for index in range(NUM_HEXES)]
+
+# for each space, a (start index, landing index) pair per direction in which
+# a piece can jump over it
+CAPTURE_RAYS = [[(start, NEIGHBOUR_TABLE[index][(direction + 3) % 6])
+                 for direction, start in enumerate(NEIGHBOUR_TABLE[index])
+                 if start is not None and NEIGHBOUR_TABLE[index][(direction + 3) % 6] is not None]
+                for index in range(NUM_HEXES)]
+
+# the space jumped over by each (start index, landing index) jump
+JUMPED_INDEX = {(index, landing): adjacent for index in range(NUM_HEXES)
+                for adjacent, landing in MOVE_RAYS[index] if landing is not None}
+
+# the indices of the spaces adjacent to each space, and the same as masks
+NEIGHBOURS = [[adjacent for adjacent in row if adjacent is not None] for row in NEIGHBOUR_TABLE]
+NEIGHBOUR_MASKS = [sum(1 << neighbour for neighbour in neighbours) for neighbours in NEIGHBOURS]
+
+# the distance from each space to the nearest exit of each colour
+EXIT_DISTANCES = [[min(hex_distance(coord, exit_coord) for exit_coord in exits) for coord in HEXES]
+                  for exits in (RED_EXITS, GREEN_EXITS, BLUE_EXITS)]
+
+# the board is the same for every colour up to a rotation by 120 degrees:
+# the index each space takes when a colour's pieces are viewed as red's
+# (green's exits are rotated onto red's by (q, r) -> (r, -q - r), and blue's
+# by (q, r) -> (-q - r, q))
+RED_FRAME_INDEX = [
+    list(range(NUM_HEXES)),
+    [HEX_INDEX[(r, -q - r)] for q, r in HEXES],
+    [HEX_INDEX[(-q - r, q)] for q, r in HEXES],
+]
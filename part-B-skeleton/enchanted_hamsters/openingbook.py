@@ -0,0 +1,147 @@
+"""
+Opening book for the enchanted_hamsters player.
+
+Every game starts from the same position, so the first few plies are
+searched offline, for much longer than a turn's budget, and the best moves
+are stored by position key. The player looks its position up before
+searching, and only searches once the game has left the book.
+
+The book covers every position reachable in the first BRANCH_PLIES plies,
+whatever the players choose, and beyond that follows the line in which every
+player keeps playing the book move, up to BOOK_PLIES plies from the start.
+Positions are keyed by the Zobrist key of their canonical form (see
+symmetry), with the move stored turned the same way, so one book serves all
+three colours, and transpositions and rotations of a position share an entry.
+
+File layout: the MAGIC bytes, then one entry per position, sorted by key: a
+little-endian 64-bit key and a 32-bit canonical move packed by pack_move.
+
+The file is generated offline, and is not part of the repository:
+    python -m enchanted_hamsters.openingbook [-b PLIES] [-p PLIES] [-t SECONDS] [-m MODE] [-o FILE]
+"""
+import argparse
+import os
+import struct
+import time
+
+from enchanted_hamsters.geometry import PLAYER_LIST
+from enchanted_hamsters.symmetry import canonical_key, rotate_move
+from enchanted_hamsters.transposition import pack_move, unpack_move
+
+# where the player looks for the book by default
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening.book')
+
+# plies in which every action is expanded, and plies the book lines run to
+BRANCH_PLIES = 2
+BOOK_PLIES = 9
+
+# CPU seconds spent searching each book position
+DEFAULT_SECONDS = 2.0
+
+MAGIC = b'CHXBOOK2'
+BOOK_ENTRY = struct.Struct('<QI')
+
+
+def position_key(state, exits, colour):
+    """
+    Finds the book key of a position.
+    :param state: the board state
+    :param exits: the list of exits made
+    :param colour: the colour index of the player to move
+    """
+    return canonical_key(state, exits, colour)
+
+
+def book_move(book, state, exits, colour):
+    """
+    Looks a position up in a book.
+    :param book: the dictionary from load_book
+    :param state: the board state
+    :param exits: the list of exits made
+    :param colour: the colour index of the player to move
+    :return: the book's action tuple for the position, or None if it has none
+    """
+    move = book.get(position_key(state, exits, colour))
+    return rotate_move(move, colour, inverse=True)
+
+
+def build(path, player_class, branch_plies=BRANCH_PLIES, book_plies=BOOK_PLIES,
+          seconds=DEFAULT_SECONDS):
+    """
+    Searches the opening positions and writes the book file.
+    :param path: the file to write
+    :param player_class: the player class whose search chooses the book moves
+    :param branch_plies: the plies in which every action is expanded
+    :param book_plies: the plies the book lines run to
+    :param seconds: the CPU seconds to search each position
+    """
+    # one searcher per colour, so each keeps its tables warm between positions
+    players = [player_class(colour) for colour in PLAYER_LIST]
+    book = {}
+    start = players[0].createBoard()
+    frontier = [(start, [0, 0, 0], 0)]
+    while frontier:
+        state, exits, ply = frontier.pop(0)
+        colour = ply % len(PLAYER_LIST)
+        key = position_key(state, exits, colour)
+        if key in book:
+            continue
+        player = players[colour]
+        player.board = state.copy()
+        player.numexits = list(exits)
+        move = player.iterative_deepening(time.process_time() + seconds)
+        book[key] = rotate_move(move, colour)
+        print(f"ply {ply}: {len(book)} positions, depth {player.completed_depth}, {move}")
+        if ply + 1 >= book_plies:
+            continue
+        if ply < branch_plies:
+            children = player.generate_moves(state, colour)
+        else:
+            children = [move]
+        for child in children:
+            child_state = state.copy()
+            child_exits = list(exits)
+            player.make_move(child_state, colour, child, child_exits)
+            frontier.append((child_state, child_exits, ply + 1))
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        for key in sorted(book):
+            file.write(BOOK_ENTRY.pack(key, pack_move(book[key])))
+
+
+def load_book(path=DEFAULT_BOOK_PATH):
+    """
+    Reads a book file, if it has been built.
+    :param path: the book file
+    :return: a {position key: canonical action tuple} dictionary, empty if there is no file
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not an opening book")
+    return {key: unpack_move(move) for key, move in BOOK_ENTRY.iter_unpack(data[len(MAGIC):])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build the enchanted_hamsters opening book")
+    parser.add_argument('-b', '--branch', type=int, default=BRANCH_PLIES,
+                        help="plies in which every action is expanded")
+    parser.add_argument('-p', '--plies', type=int, default=BOOK_PLIES,
+                        help="plies from the start the book lines run to")
+    parser.add_argument('-t', '--time', type=float, default=DEFAULT_SECONDS,
+                        help="CPU seconds to search each position")
+    parser.add_argument('-m', '--mode', choices=['maxn', 'paranoid', 'brs'], default='maxn',
+                        help="search used to choose the book moves")
+    parser.add_argument('-o', '--output', default=DEFAULT_BOOK_PATH,
+                        help="file to write the book to")
+    args = parser.parse_args()
+    # the player loads the book, so it is only imported when building one
+    from enchanted_hamsters.player import BRSPlayer, ExamplePlayer, ParanoidPlayer
+    player_class = {'maxn': ExamplePlayer, 'paranoid': ParanoidPlayer, 'brs': BRSPlayer}[args.mode]
+    build(args.output, player_class, args.branch, args.plies, args.time)
+
+
+if __name__ == '__main__':
+    main()
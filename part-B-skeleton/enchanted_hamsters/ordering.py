@@ -0,0 +1,177 @@
+"""
+Move ordering for the enchanted_hamsters alpha-beta searches.
+
+Moves are searched in this order: the best move from the transposition
+table, captures (jumps over enemy pieces) that keep the converted piece,
+exits, the killer moves of the current ply, captures the other players win
+straight back (by static exchange evaluation), and finally all remaining
+moves by their history score.
+
+Killer moves are quiet moves that caused a cutoff at the same ply in a
+sibling subtree. The history table counts, for every (from hex, to hex,
+colour), how much cutoff work that move has done anywhere in the tree.
+
+Both are kept from one turn to the next. When a new search starts, the
+killers are shifted down by the number of plies played since the last one,
+so that each ply's killers stay with the same position in the game, and the
+history scores are halved so that the new position's cutoffs soon dominate.
+
+The orderer also counts cutoffs, and how many of them came from the first
+move searched, so the quality of the ordering can be measured.
+"""
+from enchanted_hamsters.exchange import static_exchange
+from enchanted_hamsters.geometry import NUM_HEXES
+
+# killer moves remembered per ply
+KILLER_SLOTS = 2
+
+# deepest ply the orderer keeps killers for
+MAX_PLY = 64
+
+# ordering scores of each class of move; history scores stay below KILLER_SCORE
+CAPTURE_SCORE = 4000000
+EXIT_SCORE = 3000000
+KILLER_SCORE = 2000000
+LOSING_CAPTURE_SCORE = 1500000
+HISTORY_LIMIT = 1000000
+
+# exits are stored in the history table as a move to this index
+EXIT_TARGET = NUM_HEXES
+
+
+def promote(moves, first_move):
+    """
+    Moves one entry to the front of a list of moves, if it is in the list.
+    :param moves: the list of moves, which is modified
+    :param first_move: the move to put first, or None
+    :return: the list
+    """
+    if first_move is not None and first_move in moves:
+        moves.remove(first_move)
+        moves.insert(0, first_move)
+    return moves
+
+
+class MoveOrderer:
+    """
+    Killer moves, history table and cutoff counters shared by every node of
+    a player's searches.
+    """
+    def __init__(self, colours=3):
+        self.killers = [[None] * KILLER_SLOTS for ply in range(MAX_PLY)]
+        self.history = [0] * (colours * NUM_HEXES * (NUM_HEXES + 1))
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def history_index(self, colour, move):
+        """
+        Finds the history table slot of a (non-pass) action.
+        :param colour: the colour index of the player taking the action
+        :param move: the action tuple
+        """
+        target = EXIT_TARGET if move[2] is None else move[2]
+        return (colour * NUM_HEXES + move[1]) * (NUM_HEXES + 1) + target
+
+    def score(self, state, colour, move, ply):
+        """
+        Gives an action its ordering score; higher scores are searched first.
+        :param state: the board state
+        :param colour: the colour index of the player taking the action
+        :param move: the action tuple
+        :param ply: the number of plies between the search root and the action
+        """
+        action = move[0]
+        if action == "PASS":
+            return 0
+        if action == "JUMP" and not (state.masks[colour] >> move[3]) & 1:
+            if static_exchange(state, colour, move) > 0:
+                return CAPTURE_SCORE
+            return LOSING_CAPTURE_SCORE
+        if action == "EXIT":
+            return EXIT_SCORE
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            for slot in range(KILLER_SLOTS):
+                if killers[slot] == (colour, move):
+                    return KILLER_SCORE + KILLER_SLOTS - slot
+        return self.history[self.history_index(colour, move)]
+
+    def order(self, state, colour, moves, first_move, ply):
+        """
+        Orders one player's actions.
+        :param state: the board state
+        :param colour: the colour index of the player to move
+        :param moves: the list of action tuples
+        :param first_move: the action to search first (from the transposition table), or None
+        :param ply: the number of plies between the search root and these actions
+        :return: the ordered list
+        """
+        ordered = sorted(moves, key=lambda move: self.score(state, colour, move, ply), reverse=True)
+        return promote(ordered, first_move)
+
+    def order_pairs(self, state, pairs, first_pair, ply):
+        """
+        Orders (colour index, action) pairs belonging to more than one player.
+        :param state: the board state
+        :param pairs: the list of (colour index, action) pairs
+        :param first_pair: the pair to search first, or None
+        :param ply: the number of plies between the search root and these actions
+        :return: the ordered list
+        """
+        ordered = sorted(pairs, key=lambda pair: self.score(state, pair[0], pair[1], ply), reverse=True)
+        return promote(ordered, first_pair)
+
+    def record_cutoff(self, state, colour, move, ply, depth, move_number):
+        """
+        Records an action that caused a beta cutoff.
+        :param state: the board state the action was taken from
+        :param colour: the colour index of the player that took the action
+        :param move: the action tuple
+        :param ply: the number of plies between the search root and the action
+        :param depth: the number of plies that were left to search below the node
+        :param move_number: the position of the action in the searched order
+        """
+        self.cutoffs += 1
+        if move_number == 0:
+            self.first_move_cutoffs += 1
+        action = move[0]
+        # only quiet moves become killers or gain history; captures and exits
+        # are searched early anyway
+        if action == "MOVE" or (action == "JUMP" and (state.masks[colour] >> move[3]) & 1):
+            if ply < MAX_PLY:
+                killers = self.killers[ply]
+                if killers[0] != (colour, move):
+                    killers[1:] = killers[:-1]
+                    killers[0] = (colour, move)
+            index = self.history_index(colour, move)
+            self.history[index] += depth * depth
+            if self.history[index] > HISTORY_LIMIT:
+                self.age_history()
+
+    def new_search(self, plies):
+        """
+        Carries the killers and history over to a search from a later position.
+        :param plies: the number of actions played since the last search started
+        """
+        if plies:
+            kept = self.killers[plies:] if plies < MAX_PLY else []
+            self.killers = kept + [[None] * KILLER_SLOTS for ply in range(MAX_PLY - len(kept))]
+        self.age_history()
+
+    def age_history(self):
+        """
+        Halves every history score, so that recent cutoffs count for more.
+        """
+        self.history = [value // 2 for value in self.history]
+
+    def first_move_rate(self):
+        """
+        The fraction of cutoffs that came from the first move searched.
+        """
+        if self.cutoffs == 0:
+            return 0.0
+        return self.first_move_cutoffs / self.cutoffs
+
+    def reset_counters(self):
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
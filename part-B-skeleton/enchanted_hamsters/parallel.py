@@ -0,0 +1,154 @@
+"""
+Parallel search for the enchanted_hamsters player.
+
+A pool of worker processes is started once, when the player is created. Each
+worker builds its own copy of the player (with its own move ordering data),
+and all of them probe and store into the player's SharedTranspositionTable.
+Two ways of splitting the work are offered:
+
+- root split: the parent farms the root actions out, one task each, and
+  merges the values of the subtrees the workers return.
+- Lazy SMP: every worker runs its own iterative deepening search of the whole
+  root, and they cooperate only through the shared table, where each finds
+  the results the others have already stored. Odd-numbered helpers search one
+  ply deeper than even ones, so the workers spread over the tree instead of
+  repeating each other. The move of the deepest completed search is played.
+
+The referee's timer only measures the parent process, so every worker
+reports the CPU time it used for each task, and the parent charges it to the
+player's TimeManager. Workers are given a wall-clock deadline of the remaining
+CPU allowance divided by the number of workers, so that all of them together
+stay within it.
+"""
+import multiprocessing
+import time
+
+from enchanted_hamsters.bitboard import Board
+
+# the player copy owned by this worker process
+_worker_player = None
+
+
+def _init_worker(player_class, colour, table):
+    """
+    Creates the worker's own player, without a pool of its own.
+    :param player_class: the class of the player using the pool
+    :param colour: the colour of the player using the pool
+    :param table: the SharedTranspositionTable of the player using the pool
+    """
+    global _worker_player
+    player_class.WORKERS = 0
+    _worker_player = player_class(colour)
+    _worker_player.table = table
+
+
+def _cpu_deadline(wall_deadline):
+    """
+    Converts a wall-clock deadline into a process_time() deadline.
+    """
+    # a busy worker uses CPU time as fast as wall-clock time passes
+    return time.process_time() + max(0.0, wall_deadline - time.time())
+
+
+def _search_subtree(task):
+    """
+    Searches the subtree below one root action, in a worker process.
+    :param task: a (masks, exits, action, depth, wall-clock deadline, table age) tuple
+    :return: a (action, value, CPU seconds used) tuple, where value is None if
+    the deadline passed before the subtree was searched
+    """
+    masks, exits, move, depth, wall_deadline, age = task
+    start = time.process_time()
+    deadline = _cpu_deadline(wall_deadline)
+    board = Board(masks)
+    board.key = board.full_key(exits)
+    _worker_player.table.age = age
+    value = _worker_player.search_move(board, list(exits), move, depth, deadline)
+    return (move, value, time.process_time() - start)
+
+
+def _search_root(task):
+    """
+    Runs a whole iterative deepening search of the root, in a worker process.
+    :param task: a (masks, exits, helper number, wall-clock deadline, table age) tuple
+    :return: a (best action, depth completed, CPU seconds used) tuple
+    """
+    masks, exits, helper, wall_deadline, age = task
+    start = time.process_time()
+    deadline = _cpu_deadline(wall_deadline)
+    player = _worker_player
+    player.board = Board(masks)
+    player.board.key = player.board.full_key(exits)
+    player.numexits = list(exits)
+    player.helper = helper
+    # iterative_deepening starts a new search, which brings the age back up
+    # to the parent's
+    player.table.age = age - 1
+    move = player.iterative_deepening(deadline)
+    return (move, player.completed_depth, time.process_time() - start)
+
+
+class ParallelSearch:
+    """
+    A persistent pool of search workers for one player.
+    """
+    def __init__(self, player_class, colour, workers, table):
+        """
+        :param player_class: the class of the player using the pool
+        :param colour: the colour of the player using the pool
+        :param workers: the number of worker processes to start
+        :param table: the SharedTranspositionTable the workers search with
+        """
+        self.workers = workers
+        self.table = table
+        self.pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                         initargs=(player_class, colour, table))
+
+    def search(self, state, exits, moves, depth, cpu_seconds):
+        """
+        Searches the subtrees below all root actions to the same depth.
+        :param state: the board state at the root
+        :param exits: the list of exits made at the root
+        :param moves: the root actions
+        :param depth: the depth to search to, counting the root action
+        :param cpu_seconds: the total CPU time all workers together may use
+        :return: a (list of (action, value) pairs, CPU seconds used) tuple,
+        where a value is None for a subtree that ran out of time
+        """
+        wall_deadline = time.time() + cpu_seconds / self.workers
+        tasks = [(tuple(state.masks), tuple(exits), move, depth, wall_deadline, self.table.age)
+                 for move in moves]
+        results = []
+        cpu_used = 0.0
+        for move, value, used in self.pool.imap(_search_subtree, tasks):
+            results.append((move, value))
+            cpu_used += used
+        return (results, cpu_used)
+
+    def lazy_search(self, state, exits, cpu_seconds):
+        """
+        Runs one iterative deepening search of the root per worker, all
+        sharing the transposition table.
+        :param state: the board state at the root
+        :param exits: the list of exits made at the root
+        :param cpu_seconds: the total CPU time all workers together may use
+        :return: a (best action, depth completed, CPU seconds used) tuple
+        """
+        wall_deadline = time.time() + cpu_seconds / self.workers
+        tasks = [(tuple(state.masks), tuple(exits), helper, wall_deadline, self.table.age)
+                 for helper in range(self.workers)]
+        best_move = None
+        best_depth = -1
+        cpu_used = 0.0
+        for move, depth, used in self.pool.imap(_search_root, tasks):
+            # ties go to the earlier helper, which did not skip ahead
+            if depth > best_depth:
+                best_move = move
+                best_depth = depth
+            cpu_used += used
+        return (best_move, best_depth, cpu_used)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        self.table.close()
@@ -1,71 +1,146 @@
 import math
+import time
 import numpy as np
 
-# coordinate indexes
-X = 0
-Y = 1
+from enchanted_hamsters.bitboard import Board, mask_indices
+from enchanted_hamsters.exchange import static_exchange
+from enchanted_hamsters.geometry import (
+    BLUE_EXITS, BLUE_STARTS, CAPTURE_RAYS, EXIT_DISTANCES, GREEN_EXITS, GREEN_STARTS, HEXES,
+    HEX_INDEX, JUMPED_INDEX, NEIGHBOURS, NUM_HEXES, PLAYER_LIST, RED_EXITS, RED_STARTS, WINNING_EXITS)
+from enchanted_hamsters.openingbook import DEFAULT_BOOK_PATH, book_move, load_book
+from enchanted_hamsters.ordering import MoveOrderer, promote
+from enchanted_hamsters.parallel import ParallelSearch
+from enchanted_hamsters.proof import DEFAULT_PROOF_NODES, ProofSearch
+from enchanted_hamsters.race import RaceSolver, ahead_of, in_race
+from enchanted_hamsters.tablebase import DEFAULT_TABLEBASE_PATH, load_tablebase
+from enchanted_hamsters.timemanager import DEFAULT_TIME_BUDGET, TimeManager
+from enchanted_hamsters.transposition import (
+    DEFAULT_TABLE_MEGABYTES, ENTRY_DEPTH, ENTRY_FLAG, ENTRY_MOVE, ENTRY_VALUE, EXACT,
+    LOWER_BOUND, UPPER_BOUND, SharedTranspositionTable, TranspositionTable)
+from enchanted_hamsters.zobrist import SIDE_KEYS
 
-# directions relative to a space
-DIRECTION_E = 0
-DIRECTION_SE = 1
-DIRECTION_SW = 2
-DIRECTION_W = 3
-DIRECTION_NW = 4
-DIRECTION_NE = 5
-
-BOARD_EDGE = 3
 MAX_DISTANCE = 7
 
-MOVE_DISTANCE = 1
-JUMP_DISTANCE = 2
-
-RED_EXITS = [(3, -3), (3, -2), (3, -1), (3, 0)]
-GREEN_EXITS = [(-3, 3), (-2, 3), (-1, 3), (0, 3)]
-BLUE_EXITS = [(0, -3), (-1, -2), (-2, -1), (-3, 0)]
-
-EXIT_DICT = {'red': RED_EXITS, 'blue': BLUE_EXITS, 'green': GREEN_EXITS}
+# the proof search is only tried once a player is this few exits from winning
+PROOF_EXITS = 2
 
-RED_CORNERS = [(3, -3), (3, 0)]
-GREEN_CORNERS = [(-3, 3), (0, 3)]
-BLUE_CORNERS = [(0, -3), (-3, 0)]
+# iterative deepening starts at one ply and stops at this depth at the latest
+MAX_SEARCH_DEPTH = 20
 
-RED_STARTS = [(-3, 0), (-3, 1), (-3, 2), (-3, 3)]
-GREEN_STARTS = [(0, -3), (1, -3), (2, -3), (3, -3)]
-BLUE_STARTS = [(0, 3), (1, 2), (2, 1), (3, 0)]
+# search algorithms a player can use
+MAXN = 'maxn'
+PARANOID = 'paranoid'
+BRS = 'brs'
 
-# temporary holding place for exiting pieces
-EXIT_LOC = (3, 1)
+# ways of sharing a search between worker processes
+ROOT_SPLIT = 'root'
+LAZY_SMP = 'lazy'
 
-PLAYER_LIST = ['red', 'green', 'blue']
+# number of nodes searched between checks of the clock
+TIME_CHECK_INTERVAL = 64
 
-WINNING_EXITS = 4
+# the most quiescence nodes searched below any one leaf of the main search
+QUIESCENCE_NODES = 8
 
-CUTOFF_DEPTH = 3
+# the action taken when a player has no other option
+PASS_MOVE = ("PASS", None, None, None)
 
 # scaling factors for eval function
 DIST_SCALE = 10/7
 PIECE_SCALE = 10
 EXIT_SCALE = 10/4
 
+# arrays for evaluating many positions at once: the bit of each hex, each
+# colour's exit distance per hex, and the hex adjacency matrix
+HEX_BITS = np.uint64(1) << np.arange(NUM_HEXES, dtype=np.uint64)
+EXIT_DISTANCE_ARRAY = np.array(EXIT_DISTANCES, dtype=np.float64)
+ADJACENCY_ARRAY = np.zeros((NUM_HEXES, NUM_HEXES), dtype=np.float64)
+for _index, _neighbours in enumerate(NEIGHBOURS):
+    ADJACENCY_ARRAY[_index, _neighbours] = 1
+
+
+class SearchTimeout(Exception):
+    """For when a search iteration runs past its deadline."""
 
 
 class ExamplePlayer:
+    """
+    Chooses actions by searching the game tree. Every search and quiescence
+    method modifies the state and exits it is given in place, and restores
+    them before returning.
+    """
+    # the search algorithm used to choose actions
+    SEARCH_MODE = MAXN
+    # evaluate the children of maxn frontier nodes together with numpy
+    # (statically, without quiescence search)
+    BATCH_LEAVES = False
+    # extend the leaves of the search with capturing jumps until they are quiet
+    QUIESCENCE = True
+    # number of worker processes to search with (0 to search here), and how
+    # they share the work
+    WORKERS = 0
+    PARALLEL_MODE = LAZY_SMP
+    # search the position expected after the opponents' replies while
+    # update() is told of our own action
+    PONDER = False
+    # memory cap for the transposition table, in MB
+    TABLE_MEGABYTES = DEFAULT_TABLE_MEGABYTES
+    # CPU seconds the referee allows for the whole game
+    TIME_BUDGET = DEFAULT_TIME_BUDGET
+    # the race tablebase file, used by the evaluation if it has been generated
+    TABLEBASE_PATH = DEFAULT_TABLEBASE_PATH
+    # the opening book file, played from before searching if it has been built
+    BOOK_PATH = DEFAULT_BOOK_PATH
+    # nodes the proof search for a forced win may create (0 never to try)
+    PROOF_NODES = DEFAULT_PROOF_NODES
+
     def __init__(self, colour):
         """
         This method is called once at the beginning of the game to initialise
         your player. You should use this opportunity to set up your own internal
-        representation of the game state, and any other information about the 
+        representation of the game state, and any other information about the
         game state you would like to maintain for the duration of the game.
 
-        The parameter colour will be a string representing the player your 
-        program will play as (Red, Green or Blue). The value will be one of the 
+        The parameter colour will be a string representing the player your
+        program will play as (Red, Green or Blue). The value will be one of the
         strings "red", "green", or "blue" correspondingly.
         """
+        # the referee charges this method to our clock as well
+        self.clock = TimeManager(self.TIME_BUDGET)
+        start = time.process_time()
         # set up state representation
         self.colour = colour
+        self.colour_index = PLAYER_LIST.index(colour)
         self.board = self.createBoard()
-        self.updated_board = self.createBoard()
         self.numexits = [0, 0, 0]
+        self.table = TranspositionTable(self.TABLE_MEGABYTES)
+        self.orderer = MoveOrderer()
+        # mapped, not read: only the pages probed are loaded
+        self.tablebase = load_tablebase(self.TABLEBASE_PATH)
+        self.book = load_book(self.BOOK_PATH)
+        self.race_solver = RaceSolver(self.tablebase)
+        self.prover = ProofSearch(self, self.colour_index, self.PROOF_NODES)
+        # search limits, set for each iteration of a search
+        self.cutoff_depth = 1
+        self.deadline = None
+        self.nodes = 0
+        self.completed_depth = 0
+        # quiescence nodes the current leaf may still search
+        self.quiescence_left = 0
+        # actions played since the last search, to carry the killers over
+        self.plies_since_search = 0
+        # the key of the position last pondered, and how often the opponents
+        # then played into it
+        self.ponder_key = None
+        self.ponder_hits = 0
+        # Lazy SMP helpers are numbered, and odd ones search a ply deeper
+        self.helper = 0
+        # the worker pool is started once, here, rather than for every action,
+        # and the workers share one table
+        self.parallel = None
+        if self.WORKERS:
+            self.table = SharedTranspositionTable(self.TABLE_MEGABYTES)
+            self.parallel = ParallelSearch(type(self), colour, self.WORKERS, self.table)
         # assign exits according to colour
         if colour == "red":
             self.exits = RED_EXITS
@@ -73,63 +148,106 @@ class ExamplePlayer:
             self.exits = GREEN_EXITS
         else:
             self.exits = BLUE_EXITS
-
+        self.clock.used += time.process_time() - start
 
     def action(self):
         """
-        This method is called at the beginning of each of your turns to request 
+        This method is called at the beginning of each of your turns to request
         a choice of action from your program.
 
-        Based on the current state of the game, your player should select and 
-        return an allowed action to play on this turn. If there are no allowed 
-        actions, your player must return a pass instead. The action (or pass) 
-        must be represented based on the above instructions for representing 
+        Based on the current state of the game, your player should select and
+        return an allowed action to play on this turn. If there are no allowed
+        actions, your player must return a pass instead. The action (or pass)
+        must be represented based on the above instructions for representing
         actions.
         """
-        searched = self.maxn(self.board, self.colour, 0, self.numexits)[1]
+        with self.clock:
+            moves = self.generate_moves(self.board, self.colour_index)
+            # positions in the opening book need no search
+            known_move = book_move(self.book, self.board, self.numexits, self.colour_index)
+            if known_move in moves:
+                self.clock.count_turn()
+                return self.format_move(known_move)
+            # a forced win is played out without a heuristic search
+            proved_move = self.proved_move(moves)
+            if proved_move is not None:
+                self.clock.count_turn()
+                return self.format_move(proved_move)
+            critical = self.is_critical(self.board, self.colour_index, moves, self.numexits)
+            deadline = self.clock.deadline(critical)
+            # once nobody can get in our way, the fastest race is the best
+            # play, if it can be found within the turn's time
+            if in_race(self.board, self.colour_index):
+                needed = WINNING_EXITS - self.numexits[self.colour_index]
+                race_move = self.race_solver.best_move(self.board, self.colour_index, needed, deadline)
+                if race_move is not None:
+                    return self.format_move(race_move)
+            # a correct ponder has left a deeper search of this position in
+            # the transposition table; its time was already charged to the
+            # clock when it ran, so the turn keeps its full budget
+            if self.ponder_key is not None and self.ponder_key == self.board.key:
+                self.ponder_hits += 1
+            self.ponder_key = None
+            searched = self.iterative_deepening(deadline)
         if searched:
-            return searched
+            return self.format_move(searched)
         else :
             return ("PASS", None)
 
+    def proved_move(self, moves):
+        """
+        Looks for an action that wins by force, near the end of the game.
+        :param moves: the actions available
+        :return: the winning action, or None if no win was proved
+        """
+        colour = self.colour_index
+        if not self.PROOF_NODES or WINNING_EXITS - self.numexits[colour] > PROOF_EXITS:
+            return None
+        # a single action that wins needs no proof tree
+        if WINNING_EXITS - self.numexits[colour] == 1:
+            move = next((move for move in moves if move[0] == "EXIT"), None)
+            if move is not None:
+                return move
+        proved, move = self.prover.prove(self.board, self.numexits, colour)
+        return move if proved else None
+
     def update(self, colour, action):
         """
-        This method is called at the end of every turn (including your player’s 
-        turns) to inform your player about the most recent action. You should 
-        use this opportunity to maintain your internal representation of the 
+        This method is called at the end of every turn (including your player’s
+        turns) to inform your player about the most recent action. You should
+        use this opportunity to maintain your internal representation of the
         game state and any other information about the game you are storing.
 
         The parameter colour will be a string representing the player whose turn
-        it is (Red, Green or Blue). The value will be one of the strings "red", 
+        it is (Red, Green or Blue). The value will be one of the strings "red",
         "green", or "blue" correspondingly.
 
-        The parameter action is a representation of the most recent action (or 
+        The parameter action is a representation of the most recent action (or
         pass) conforming to the above in- structions for representing actions.
 
-        You may assume that action will always correspond to an allowed action 
-        (or pass) for the player colour (your method does not need to validate 
+        You may assume that action will always correspond to an allowed action
+        (or pass) for the player colour (your method does not need to validate
         the action/pass against the game rules).
         """
 
-        if action[0] == 'PASS':
-            pass
-        # if the action is a jump or move
-        elif isinstance(action[1][0], tuple):
-            coord = action[1][0]
-            new_coord = action[1][1]
-            self.updated_board = self.update_board(self.updated_board, coord, new_coord)
-            # change the colour of a piece that is jumped over
-            if action[0] == 'JUMP':
-                jumpedover = self.jumped_piece(coord, new_coord)
-                self.updated_board = self.jump_update(self.updated_board, jumpedover, colour)
-        # if the action is an exit
-        elif action[0] == 'EXIT':
-            colour_index = PLAYER_LIST.index(colour)
-            self.numexits[colour_index] += 1
-            coord = action[1]
-            self.updated_board = self.make_exit(coord, self.updated_board)
-        # make final updates
-        self.board = dict(self.updated_board)
+        with self.clock:
+            self.plies_since_search += 1
+            if action[0] == 'PASS':
+                pass
+            # if the action is a jump or move, the jumped piece is converted by update_board
+            elif isinstance(action[1][0], tuple):
+                coord = action[1][0]
+                new_coord = action[1][1]
+                self.board = self.update_board(self.board, coord, new_coord)
+            # if the action is an exit
+            elif action[0] == 'EXIT':
+                colour_index = PLAYER_LIST.index(colour)
+                self.board.record_exit(colour_index, self.numexits[colour_index])
+                self.numexits[colour_index] += 1
+                coord = action[1]
+                self.board = self.make_exit(coord, self.board)
+            if self.PONDER and colour == self.colour:
+                self.ponder()
 
     def startinPieces(self, colour):
         """
@@ -150,162 +268,81 @@ class ExamplePlayer:
         """
         This function creates the initial board state.
         """
-        board = {}
-        for blue in BLUE_STARTS:
-            board[blue] = 'blue'
-        for green in GREEN_STARTS:
-            board[green] = 'green'
-        for red in RED_STARTS:
-            board[red] = 'red'
-        return board
+        return Board.initial()
 
     def exit_distances(self, state, colour):
         """
         This function averages the distance of all a player's pieces from the exits.
         :param state: the current board state
-        :param colour: the colour of the player
+        :param colour: the colour index of the player
         :return: the average distance from the exits
         """
-        state_val = 0
-        piece_count = 0
-        exits = EXIT_DICT[colour]
-        # iterate through all pieces on the board
-        for piece in self.dict_to_tuple(state):
-            min_piece_distance = MAX_DISTANCE
-            # ignore other player pieces
-            if piece[1] == colour:
-                piece_count += 1
-                # calculate the distance from the piece to each of the exits
-                for exit_location in exits:
-                    if self.distance(piece[0], exit_location) < min_piece_distance:
-                        min_piece_distance = self.distance(piece[0], exit_location)
-                # add the distance to the closest exit to the overall state value
-                state_val += min_piece_distance
+        # the board keeps the summed distance of each colour's pieces up to date
+        piece_count = state.counts[colour]
         # assume the average distance of no pieces is in the middle
         if piece_count == 0:
             return MAX_DISTANCE / 2
-        return state_val / piece_count
-
-    def z_coordinate(self, coord):
-        """
-        Gives the mathematical z-coordinate of a space, given its x and y coordinates
-        :param coord: a two-tuple containing the x and y coordinates of a space
-        :return: the value of the z-coordinate
-        """
-        return -(coord[X]) - coord[Y]
+        return state.dist_sums[colour] / piece_count
 
-    def distance(self, coord1, coord2):
+    def race_distance(self, state, colour, exits):
         """
-        Calculates the Euclidean heaxagonal distance between two spaces
-        :param coord1: a tuple containing an x and y coordinate
-        :param coord2: a second tuple containing an x and y coordinate
-        :return: the number of spaces need to traverse from coord1 to coord2
+        Measures how far a player is from winning: once the player is racing
+        (see race.in_race) and the race tablebase covers its pieces, the exact
+        number of moves and jumps per exit it still needs, and otherwise the
+        average distance of the pieces from the exits.
+        :param state: the current board state
+        :param colour: the colour index of the player
+        :param exits: the list of exits made
+        :return: the distance per exit
         """
-        z_coord1 = self.z_coordinate(coord1)
-        z_coord2 = self.z_coordinate(coord2)
-        return int((abs(coord2[X] - coord1[X]) + abs(coord2[Y] - coord1[Y]) + abs(z_coord2 - z_coord1)) / 2)
+        needed = WINNING_EXITS - exits[colour]
+        # the table assumes nothing gets in the way, which only holds in a race
+        if self.tablebase_covers(state.counts[colour], needed) and in_race(state, colour):
+            return self.tablebase_distance(colour, state.masks[colour], needed)
+        return self.exit_distances(state, colour)
 
-    def is_empty_space(self, coord):
+    def tablebase_covers(self, count, needed):
         """
-        Determines if a space has a piece on it.
-        :param coord: the x and y coordinates of the space
-        :return: a boolean value indicating True if there is no piece on the space, False otherwise.
+        Determines if the race tablebase has entries for a player's pieces.
+        :param count: the number of the player's pieces
+        :param needed: the number of exits the player still has to make
         """
-        if not self.is_on_board(coord[X], coord[Y]):
-            return False
-        elif coord not in self.board or self.board[coord] == "":
-            return True
-        return False
+        return self.tablebase is not None and 0 < needed <= count <= self.tablebase.max_pieces
 
-    def is_on_board(self, x, y):
+    def tablebase_distance(self, colour, mask, needed):
         """
-        Determines if a space is part of the game board.
-        :param x: x coordinate of the space
-        :param y: y coordinate of the space
-        :return: boolean True if the space is part of the game board, False otherwise
+        Looks up the exact number of moves and jumps per exit a racing player
+        still needs.
+        :param colour: the colour index of the player
+        :param mask: the mask of the player's pieces
+        :param needed: the number of exits the player still has to make
+        :return: the distance per exit
         """
-        if abs(x) > BOARD_EDGE or abs(y) > BOARD_EDGE or abs(self.z_coordinate((x, y))) > BOARD_EDGE:
-            return False
-        return True
+        actions = self.tablebase.probe(colour, mask, needed)
+        # the exit actions themselves are rewarded by the exits criterion
+        return (actions - needed) / needed
 
     def can_exit(self, state, piece):
         """
         Determines if a particular piece is able to exit.
         :param state: the current game state
-        :param piece: a tuple indicating the coordinates of the piece
+        :param piece: the hex index of the piece
         :return: a boolean value of True if the piece is located on an exit of its colour
         """
-        if state[piece] == 'red':
-            if piece in RED_EXITS:
-                return True
-        elif state[piece] == 'green':
-            if piece in GREEN_EXITS:
-                return True
-        elif state[piece] == 'blue':
-            if piece in BLUE_EXITS:
-                return True
-        return False
+        colour = state.owner(piece)
+        if colour is None:
+            return False
+        return state.can_exit(colour, piece)
 
-    def can_move(self, coord):
+    def can_move(self, state, piece):
         """
         Finds all the legal moves or jumps a piece can make
-        :param coord: the location of the piece
-        :return: a list containing the coordinates of the piece's next possible locations
-        """
-        [x, y] = coord
-        move_list = [None] * 6
-        # check if a move or jump can be made to the east
-        if self.is_empty_space((x + 1, y)):
-            move_list[DIRECTION_E] = (x + 1, y)
-        elif self.is_empty_space((x + 2, y)):
-            move_list[DIRECTION_E] = (x + 2, y)
-        # check if a move or jump can be made to the southeast
-        if self.is_empty_space((x + 1, y - 1)):
-            move_list[DIRECTION_NE] = (x + 1, y - 1)
-        elif self.is_empty_space((x + 2, y - 2)):
-            move_list[DIRECTION_NE] = (x + 2, y - 2)
-        # check if a move or jump can be made to the southwest
-        if self.is_empty_space((x, y + 1)):
-            move_list[DIRECTION_SE] = (x, y + 1)
-        elif self.is_empty_space((x, y + 2)):
-            move_list[DIRECTION_SE] = (x, y + 2)
-        # check if a move or jump can be made to the west
-        if self.is_empty_space((x - 1, y)):
-            move_list[DIRECTION_W] = (x - 1, y)
-        elif self.is_empty_space((x - 2, y)):
-            move_list[DIRECTION_W] = (x - 2, y)
-        # check if a move or jump can be made to the northwest
-        if self.is_empty_space((x - 1, y + 1)):
-            move_list[DIRECTION_SW] = (x - 1, y + 1)
-        elif self.is_empty_space((x - 2, y + 2)):
-            move_list[DIRECTION_SW] = (x - 2, y + 2)
-        # check if a move or jump can be made to the northeast
-        if self.is_empty_space((x, y - 1)):
-            move_list[DIRECTION_NW] = (x, y - 1)
-        elif self.is_empty_space((x, y - 2)):
-            move_list[DIRECTION_NW] = (x, y - 2)
-        return move_list
-
-    def action_type(self, old_coord, new_coord):
-        """
-        Determines what type of action is made by a piece
-        :param old_coord: the location of the piece before the move
-        :param new_coord: the location of the piece after the move
-        :return: a string indicating the action type
-        """
-        if old_coord is None:
-            return "PASS"
-        elif new_coord is None:
-            return "EXIT"
-        elif self.distance(old_coord, new_coord) == MOVE_DISTANCE:
-            return "MOVE"
-        elif self.distance(old_coord, new_coord) == JUMP_DISTANCE:
-            return "JUMP"
-        else:
-            return None
-
-    def dict_to_tuple(self, state):
-        return tuple(state.items())
+        :param state: the current game state
+        :param piece: the hex index of the piece
+        :return: a list of (new index, jumped index) pairs for the piece's next
+        possible locations, the jumped index being None for a plain move
+        """
+        return state.move_targets(piece)
 
     def update_board(self, board, coord, new_coord):
         """
@@ -315,79 +352,95 @@ class ExamplePlayer:
         :param new_coord: the final coordinate of the piece taking action
         :return: the updated board state
         """
-        # remove the old coordinate's player
-        color = board[coord]
+        index = HEX_INDEX[coord]
+        new_index = HEX_INDEX[new_coord]
+        colour = board.owner(index)
         # change colour of a piece that gets jumped over
-        if self.distance(coord, new_coord) == JUMP_DISTANCE:
-            self.jump_update(board, self.jumped_piece(coord, new_coord), color)
-        del board[coord]
-        # place the player on the new coordinate
-        if new_coord != EXIT_LOC:
-            board[new_coord] = color
+        jumped = JUMPED_INDEX.get((index, new_index))
+        if jumped is not None:
+            self.jump_update(board, jumped, colour)
+        # move the player from the old coordinate onto the new coordinate
+        board.remove(index, colour)
+        board.place(new_index, colour)
         return board
 
-    def format_move(self, old_coord, new_coord=None):
+    def format_move(self, move):
         """
         Formats an action according to referee specifications
-        :param old_coord: initial location of the piece taking action
-        :param new_coord: final location of the piece taking action
+        :param move: an (action type, old index, new index, jumped index) tuple
         :return: a tuple containing the action's type and old and new locations
         """
-        action = self.action_type(old_coord, new_coord)
-        # if the action is an exit, remove piece from board
-        if old_coord is None:
+        action, old_index, new_index = move[0], move[1], move[2]
+        if action == "PASS":
             return (action, None)
-        if new_coord is None:
-            return (action, tuple(old_coord))
-        # if the action is a move or jump, move piece to its next location
-        else:
-            return (action, (tuple(old_coord), tuple(new_coord)))
+        # if the action is an exit, there is no new location
+        if action == "EXIT":
+            return (action, HEXES[old_index])
+        # if the action is a move or jump, give both locations
+        return (action, (HEXES[old_index], HEXES[new_index]))
 
-    def generate_next_states(self, state, colour):
+    def generate_moves(self, state, colour):
         """
-        Generates all the possible states after a player makes an action.
+        Generates all the actions a player can take.
         :param state: the game state before the player takes action
-        :param colour: the colour of the player
-        :return: a list of all state values that would result from the player's next action
-        """
-        next_state = []
-        for piece in state:
-            if state[piece] == colour:
-                if self.can_exit(state, piece):
-                    tmp_board = state.copy()
-                    tmp_board = self.make_exit(piece, tmp_board)
-                    next_state.append(tmp_board)
-                # if the piece can move or jump, generate a new state for its possible actions
-                for move in self.can_move(piece):
-                    if move:
-                        tmp_board = state.copy()
-                        tmp_board = self.update_board(tmp_board, piece, move)
-                        next_state.append(tmp_board)
-        # if the player must pass, the board state will remain the same
-        if len(next_state) == 0:
-            next_state.append(state)
-            return next_state
-        return next_state
-
-    def state_diff(self, state1, state2):
-        """
-        Finds the old and new coordinates of a piece that has moved
-        :param state1: the board state before a move
-        :param state2: the board state after a move
-        :return: the filled spaces that have changed between the states
-        """
-        diff = [None, None]
-        for piece in state1:
-            if piece not in state2:
-                diff[0] = piece
-                # if a piece has exited between states, there is no new location
-                if len(state2) < len(state1):
-                    return diff
-                # if a piece has moved between states, find new location
-                for new_piece in state2:
-                    if new_piece not in state1:
-                        diff[1] = new_piece
-        return diff
+        :param colour: the colour index of the player
+        :return: a list of (action type, old index, new index, jumped index) tuples
+        """
+        moves = []
+        for piece in state.pieces(colour):
+            if state.can_exit(colour, piece):
+                moves.append(("EXIT", piece, None, None))
+            # add the piece's possible moves and jumps, looked up by the
+            # occupancy around it
+            moves.extend(state.move_actions(piece))
+        # if the player has no actions, it must pass
+        if len(moves) == 0:
+            moves.append(PASS_MOVE)
+        return moves
+
+    def make_move(self, state, colour, move, exits):
+        """
+        Applies an action to a board in place.
+        :param state: the board state, which is modified
+        :param colour: the colour index of the player taking action
+        :param move: the action tuple to apply
+        :param exits: the list of exits made, which is modified
+        :return: the information unmake_move needs to take the action back
+        """
+        action, old_index, new_index, jumped = move
+        if action == "PASS":
+            return None
+        state.remove(old_index, colour)
+        if action == "EXIT":
+            state.record_exit(colour, exits[colour])
+            exits[colour] += 1
+            return None
+        state.place(new_index, colour)
+        # remember the original colour of a piece that gets jumped over
+        if action == "JUMP":
+            return self.jump_update(state, jumped, colour)
+        return None
+
+    def unmake_move(self, state, colour, move, exits, undo):
+        """
+        Takes back an action applied by make_move.
+        :param state: the board state, which is modified
+        :param colour: the colour index of the player that took the action
+        :param move: the action tuple that was applied
+        :param exits: the list of exits made, which is modified
+        :param undo: the value make_move returned for this action
+        """
+        action, old_index, new_index, jumped = move
+        if action == "PASS":
+            return
+        if action == "EXIT":
+            exits[colour] -= 1
+            state.record_exit(colour, exits[colour])
+        else:
+            if action == "JUMP":
+                self.jump_update(state, jumped, undo)
+            state.remove(new_index, colour)
+        state.place(old_index, colour)
 
     def make_exit(self, coord, state):
         """
@@ -396,105 +449,279 @@ class ExamplePlayer:
         :param state: the board state before the exit is made
         :return: the new state
         """
-        del state[coord]
+        index = HEX_INDEX[coord]
+        state.remove(index, state.owner(index))
         return state
 
-    def jumped_piece(self, oldcoord, newcoord):
-        """
-        Finds the piece that is jumped over
-        :param oldcoord: the initial location of a piece that jumps
-        :param newcoord: the location the jumping piece jumps to
-        :return: the coordinates of the space that was jumped over
-        """
-        x1 = newcoord[0]
-        y1 = newcoord[1]
-        x2 = oldcoord[0]
-        y2 = oldcoord[1]
-
-        # the difference in x and y values
-        diffX = x1 - x2
-        diffY = y1 - y2
-
-        # for a horizontal jump
-        if abs(diffX) == JUMP_DISTANCE and diffY == 0:
-            return (x1 - int(1 * np.sign(diffX)), y1)
-        # for a diagonal jump
-        elif abs(diffX) == JUMP_DISTANCE and abs(diffY) == JUMP_DISTANCE:
-            return (x1 - int(1 * np.sign(diffX)), y1 - int(1 * np.sign(diffY)))
-        elif diffX == 0 and abs(diffY) == JUMP_DISTANCE:
-            return (x1, y1 - int(1 * np.sign(diffY)))
-
-
     def find_numpieces(self, colour, state):
         """
         Finds the number of pieces a player has on the board
-        :param colour: the player's colour
+        :param colour: the colour index of the player
         :param state: the current board state
         :return: the number of pieces of the player's colour on the board
         """
-        numpieces = 0
-        for piece in self.dict_to_tuple(state):
-            if piece[1] == colour:
-                numpieces += 1
-        return numpieces
+        return state.count(colour)
 
-    def jump_update(self, board, coord, colour):
+    def jump_update(self, board, index, colour):
         """
         Updates the colour of a piece being jumped
-        :param board: the initial board state
-        :param coord: the coordinate of the piece being jumped
-        :param colour: the new colour of the converted piece
-        :return: the new board state
+        :param board: the board state, which is modified
+        :param index: the hex index of the piece being jumped
+        :param colour: the new colour index of the converted piece
+        :return: the colour index the piece had before the jump
         """
-        board[coord] = colour
-        return board
+        return board.set_owner(index, colour)
 
     def next_player(self, colour):
         """
         Finds the colour of the next player to make an action
-        :param colour: the colour of the current player
-        :return: the next player's colour
-        """
-        next_player_index = (PLAYER_LIST.index(colour) + 1) % len(PLAYER_LIST)
-        return PLAYER_LIST[next_player_index]
-
-    def generate_surroundings(self, coord):
-        """
-        Finds the spaces surrounding a given space
-        :param coord: the coordinates of the space
-        :return: a list of the spaces immediately adjacent to the space
-        """
-        x = coord[0]
-        y = coord[1]
-        move_list = []
-        # show all directions
-        move_list.append((x + 1, y))
-        move_list.append((x + 1, y - 1))
-        move_list.append((x, y + 1))
-        move_list.append((x - 1, y))
-        move_list.append((x - 1, y + 1))
-        move_list.append((x, y - 1))
-        return move_list
+        :param colour: the colour index of the current player
+        :return: the next player's colour index
+        """
+        return (colour + 1) % len(PLAYER_LIST)
 
     def find_captors(self, state, colour):
         """
         Estimates the number of enemies can capture a piece in a given state.
         :param state: the current board state
-        :param colour: the colour of the pieces that may be captured
+        :param colour: the colour index of the pieces that may be captured
         :return: the number of enemy pieces adjacent to player pieces
         """
-        evaluation_num = 0
-        for space in list(state.keys()):
-            # check surroundings
-            if state[space] == colour:
-                surroundings = self.generate_surroundings(space)
-                for possible_enemy in surroundings:
-                    if possible_enemy in list(state.keys()) and state[possible_enemy] != colour:
-                        evaluation_num += 1
-                    else:
-                        continue
+        # the board keeps the number of adjacent enemy pairs up to date
+        return state.threats[colour]
 
-        return evaluation_num
+    def iterative_deepening(self, deadline):
+        """
+        Searches one ply deeper at a time until the deadline passes, keeping
+        the best move of the deepest iteration that finished. Each iteration
+        leaves its best moves in the transposition table, which the next
+        iteration searches first. The table, killers and history also carry
+        over from the previous turn's search, whose subtree below the actions
+        actually played is usually still in the table.
+        :param deadline: the process_time() value (CPU seconds, the clock the
+        referee charges) by which the search must stop
+        :return: the best action tuple found, or None if there is none
+        """
+        self.table.new_search()
+        self.orderer.new_search(self.plies_since_search)
+        self.plies_since_search = 0
+        moves = self.generate_moves(self.board, self.colour_index)
+        # there is nothing to search if only one action is available
+        if len(moves) == 1:
+            return moves[0]
+        if self.parallel is not None:
+            if self.PARALLEL_MODE == LAZY_SMP:
+                return self.lazy_smp(deadline)
+            return self.parallel_deepening(moves, deadline)
+        best_move = None
+        self.completed_depth = 0
+        self.nodes = 0
+        for depth in range(1 + self.helper % 2, MAX_SEARCH_DEPTH + 1):
+            self.cutoff_depth = depth
+            # the first iteration always finishes, so there is always a move to play
+            self.deadline = deadline if best_move is not None else None
+            # search on copies so the real game state is never touched
+            try:
+                best_move = self.search(self.board.copy(), list(self.numexits))
+            except SearchTimeout:
+                break
+            self.completed_depth = depth
+            if time.process_time() >= deadline:
+                break
+        self.deadline = None
+        return best_move
+
+    def ponder(self):
+        """
+        Searches the position we expect to face at our next turn, after the
+        replies the opponents are predicted to play, so that the results are
+        waiting in the transposition table. This runs inside update(), so
+        the referee charges it to us, and it is limited by the TimeManager's
+        ponder budget.
+        """
+        start = time.process_time()
+        state = self.board.copy()
+        exits = list(self.numexits)
+        colour = self.colour_index
+        for reply in range(len(PLAYER_LIST) - 1):
+            colour = self.next_player(colour)
+            self.make_move(state, colour, self.predict_move(state, colour, exits), exits)
+        if max(exits) >= WINNING_EXITS:
+            return
+        board, numexits = self.board, self.numexits
+        self.board, self.numexits = state, exits
+        # the ponder root is two actions past the real position
+        self.plies_since_search += len(PLAYER_LIST) - 1
+        try:
+            self.iterative_deepening(start + self.clock.ponder_budget())
+        finally:
+            self.board, self.numexits = board, numexits
+        # the opponents' actions bring this back to 0 at the pondered position
+        self.plies_since_search = 1 - len(PLAYER_LIST)
+        self.ponder_key = state.key
+
+    def predict_move(self, state, colour, exits):
+        """
+        Guesses an opponent's action: the best move the last search stored
+        for the position, or else the action with the best immediate
+        evaluation for that opponent.
+        :param state: the board state, which is modified and restored
+        :param colour: the colour index of the opponent
+        :param exits: the list of exits made, which is modified and restored
+        :return: the predicted action tuple
+        """
+        moves = self.generate_moves(state, colour)
+        entry = self.table.probe(state.key ^ SIDE_KEYS[colour])
+        if entry is not None:
+            move = entry[ENTRY_MOVE]
+            # Best-Reply Search stores (colour index, action) pairs
+            if move is not None and len(move) == 2:
+                move = move[1] if move[0] == colour else None
+            if move in moves:
+                return move
+        best_move = None
+        best_value = -math.inf
+        for move in moves:
+            undo = self.make_move(state, colour, move, exits)
+            value = self.evaluation(state, exits)[colour]
+            self.unmake_move(state, colour, move, exits, undo)
+            if value > best_value:
+                best_move = move
+                best_value = value
+        return best_move
+
+    def lazy_smp(self, deadline):
+        """
+        Has every worker search the whole root at once, sharing the
+        transposition table. The CPU time the workers use is charged to our
+        clock.
+        :param deadline: the process_time() value by which the search must stop
+        :return: the best action tuple found
+        """
+        cpu_seconds = deadline - time.process_time()
+        best_move, self.completed_depth, used = self.parallel.lazy_search(
+            self.board, self.numexits, cpu_seconds)
+        self.clock.charge(used)
+        return best_move
+
+    def parallel_deepening(self, moves, deadline):
+        """
+        Iterative deepening with the root actions split across the worker
+        pool. The CPU time the workers use is charged to our clock, and
+        counts towards the deadline as if it had been used here.
+        :param moves: the root actions
+        :param deadline: the process_time() value by which the search must stop
+        :return: the best action tuple found
+        """
+        allowance = deadline - time.process_time()
+        best_move = None
+        self.completed_depth = 0
+        for depth in range(1, MAX_SEARCH_DEPTH + 1):
+            # the first iteration always finishes, so there is always a move to play
+            cpu_seconds = allowance if best_move is not None else math.inf
+            results, used = self.parallel.search(self.board, self.numexits, promote(moves, best_move),
+                                                 depth, cpu_seconds)
+            self.clock.charge(used)
+            allowance -= used
+            if any(value is None for move, value in results):
+                break
+            best_move = max(results, key=lambda result: self.root_score(result[1]))[0]
+            self.completed_depth = depth
+            if allowance <= 0 or time.process_time() >= deadline:
+                break
+        return best_move
+
+    def root_score(self, value):
+        """
+        Finds our score in a value returned by the search mode in use.
+        :param value: an evaluation vector for maxn, or our score for the other modes
+        """
+        if self.SEARCH_MODE == MAXN:
+            return value[self.colour_index]
+        return value
+
+    def search_move(self, state, exits, move, depth, deadline):
+        """
+        Searches the subtree below one of our root actions (used by the
+        parallel search workers).
+        :param state: the board state at the root, which is modified
+        :param exits: the list of exits made at the root, which is modified
+        :param move: the root action to search below
+        :param depth: the depth to search to, counting the root action
+        :param deadline: the process_time() value by which the search must stop
+        :return: the value of the action, or None if the deadline passed first
+        """
+        self.cutoff_depth = depth
+        self.deadline = deadline
+        self.nodes = 0
+        me = self.colour_index
+        self.make_move(state, me, move, exits)
+        try:
+            if self.SEARCH_MODE == PARANOID:
+                return self.paranoid(state, self.next_player(me), 1, exits, -math.inf, math.inf)[0]
+            if self.SEARCH_MODE == BRS:
+                return self.brs(state, 1, exits, -math.inf, math.inf)[0]
+            return self.maxn(state, self.next_player(me), 1, exits)[0]
+        except SearchTimeout:
+            return None
+        finally:
+            self.deadline = None
+
+    def search(self, state, exits):
+        """
+        Runs one search iteration from our turn, with the algorithm chosen by
+        SEARCH_MODE.
+        :param state: the board state, which is modified while searching
+        :param exits: the list of exits made, which is modified while searching
+        :return: the best action tuple found
+        """
+        if self.SEARCH_MODE == PARANOID:
+            return self.paranoid(state, self.colour_index, 0, exits, -math.inf, math.inf)[1]
+        if self.SEARCH_MODE == BRS:
+            # the root layer is ours, so only the action of the pair is needed
+            return self.brs(state, 0, exits, -math.inf, math.inf)[1][1]
+        return self.maxn(state, self.colour_index, 0, exits)[1]
+
+    def is_critical(self, state, colour, moves, exits):
+        """
+        Determines if a position deserves more thinking time than usual: when
+        an enemy piece can be captured, or when a player is one exit from winning.
+        :param state: the board state
+        :param colour: the colour index of the player to move
+        :param moves: the player's available actions
+        :param exits: the list of exits made
+        :return: boolean True if the position is critical
+        """
+        if max(exits) >= WINNING_EXITS - 1:
+            return True
+        for move in moves:
+            if move[0] == "JUMP" and not (state.masks[colour] >> move[3]) & 1:
+                return True
+        return False
+
+    def check_time(self):
+        """
+        Stops the current search iteration if its deadline has passed. The
+        clock is only read every TIME_CHECK_INTERVAL nodes.
+        """
+        self.nodes += 1
+        if (self.deadline is not None and self.nodes % TIME_CHECK_INTERVAL == 0
+                and time.process_time() > self.deadline):
+            raise SearchTimeout()
+
+    def order_moves(self, state, colour, moves, first_move, ply):
+        """
+        Orders moves so the ones most likely to be best are searched first:
+        the best move from an earlier search, then captures of enemy pieces,
+        then exits, then killer moves, then the rest by history score.
+        :param state: the board state
+        :param colour: the colour index of the player to move
+        :param moves: the list of action tuples
+        :param first_move: the move to search first, or None
+        :param ply: the number of plies between the search root and these moves
+        :return: the ordered list
+        """
+        return self.orderer.order(state, colour, moves, first_move, ply)
 
     def should_cutoff(self, depth, exits):
         """
@@ -503,26 +730,177 @@ class ExamplePlayer:
         :param exits: the list of exits that have been made
         :return: boolean value True if the game has been won, False otherwise
         """
-        if depth >= CUTOFF_DEPTH:
+        if depth >= self.cutoff_depth:
             return True
         for player in exits:
-            if player >= 4:
+            if player >= WINNING_EXITS:
                 return True
         return False
 
+    def generate_captures(self, state, colour):
+        """
+        Generates the jumps a player can make over enemy pieces, converting them.
+        :param state: the board state
+        :param colour: the colour index of the player
+        :return: a list of ("JUMP", old index, new index, jumped index) tuples
+        """
+        captures = []
+        # a capture needs a piece standing next to an enemy piece
+        if not state.threats[colour]:
+            return captures
+        occupied = state.occupied()
+        mine = state.masks[colour]
+        targets = state.threat_map().over[colour] & occupied & ~mine
+        for target in mask_indices(targets):
+            for start, landing in CAPTURE_RAYS[target]:
+                if (mine >> start) & 1 and not (occupied >> landing) & 1:
+                    captures.append(("JUMP", start, landing, target))
+        return captures
+
+    def winning_captures(self, state, colour):
+        """
+        Generates the captures that keep the converted piece, by static
+        exchange evaluation; the others are left to the full search.
+        :param state: the board state
+        :param colour: the colour index of the player
+        :return: a list of ("JUMP", old index, new index, jumped index) tuples
+        """
+        return [move for move in self.generate_captures(state, colour)
+                if static_exchange(state, colour, move) > 0]
+
+    def stand_pat(self, state, exits):
+        """
+        Evaluates a quiescence node, spending one of the nodes the leaf may be
+        extended by.
+        :param state: the node's state
+        :param exits: the number of exits made at this state
+        :return: the evaluation, and True if the node may still be extended
+        with captures
+        """
+        self.check_time()
+        value = self.evaluation(state, exits)
+        if self.quiescence_left <= 0:
+            return value, False
+        self.quiescence_left -= 1
+        return value, True
+
+    def maxn_quiescence(self, state, player, exits):
+        """
+        Extends a maxn leaf with the winning captures of each player in turn,
+        until the player to move has none. A player may always decline to
+        capture.
+        :param state: the leaf state
+        :param player: the colour index of the player to move
+        :param exits: the number of exits made at this state
+        :return: the evaluation of the quiet position
+        """
+        value, extend = self.stand_pat(state, exits)
+        if not extend:
+            return value
+        next_player = self.next_player(player)
+        for move in self.winning_captures(state, player):
+            undo = self.make_move(state, player, move, exits)
+            next_v = self.maxn_quiescence(state, next_player, exits)
+            self.unmake_move(state, player, move, exits, undo)
+            if next_v[player] > value[player]:
+                value = next_v
+        return value
+
+    def window_quiescence(self, state, exits, alpha, beta, maximising, colours, deeper):
+        """
+        Extends a leaf of a two-sided alpha-beta search (paranoid or BRS) with
+        winning captures only. The side to move may stand pat on the leaf's
+        evaluation rather than capture.
+        :param state: the leaf state
+        :param exits: the number of exits made at this state
+        :param alpha: the score we are already guaranteed
+        :param beta: the score the other side can already hold us to
+        :param maximising: True if it is our side to move
+        :param colours: the colour indexes whose captures are tried
+        :param deeper: a function of (alpha, beta) that searches the position
+        after a capture
+        :return: our evaluation of the quiet position
+        """
+        value, extend = self.stand_pat(state, exits)
+        value = value[self.colour_index]
+        if not extend:
+            return value
+        # standing pat may already be enough to decide this node
+        if maximising:
+            if value >= beta:
+                return value
+            alpha = max(alpha, value)
+        else:
+            if value <= alpha:
+                return value
+            beta = min(beta, value)
+        for colour in colours:
+            for move in self.winning_captures(state, colour):
+                undo = self.make_move(state, colour, move, exits)
+                next_v = deeper(alpha, beta)
+                self.unmake_move(state, colour, move, exits, undo)
+                if maximising:
+                    if next_v > value:
+                        value = next_v
+                        alpha = max(alpha, value)
+                elif next_v < value:
+                    value = next_v
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+        return value
+
+    def paranoid_quiescence(self, state, player, exits, alpha, beta):
+        """
+        Extends a paranoid leaf with winning captures only, until the player
+        to move has none. Every player may stand pat on the leaf's evaluation
+        rather than capture.
+        :param state: the leaf state
+        :param player: the colour index of the player to move
+        :param exits: the number of exits made at this state
+        :param alpha: the score we are already guaranteed
+        :param beta: the score the other players can already hold us to
+        :return: our evaluation of the quiet position
+        """
+        next_player = self.next_player(player)
+        return self.window_quiescence(
+            state, exits, alpha, beta, player == self.colour_index, [player],
+            lambda a, b: self.paranoid_quiescence(state, next_player, exits, a, b))
+
+    def brs_quiescence(self, state, depth, exits, alpha, beta):
+        """
+        Extends a Best-Reply Search leaf with winning captures only: our
+        captures on even depths, and either opponent's on odd depths, until
+        the side to move has none. Either side may stand pat on the leaf's evaluation.
+        :param state: the leaf state
+        :param depth: the depth of the leaf; even depths are our turns
+        :param exits: the number of exits made at this state
+        :param alpha: the score we are already guaranteed
+        :param beta: the score the opponents can already hold us to
+        :return: our evaluation of the quiet position
+        """
+        me = self.colour_index
+        if depth % 2 == 0:
+            colours = [me]
+        else:
+            colours = [self.next_player(me), self.next_player(self.next_player(me))]
+        return self.window_quiescence(
+            state, exits, alpha, beta, depth % 2 == 0, colours,
+            lambda a, b: self.brs_quiescence(state, depth + 1, exits, a, b))
+
     def piece_eval(self, player, state, exits):
         """
         Function for evaluating the number of a player's pieces
-        :param player: the colour of the player
+        :param player: the colour index of the player
         :param state: the projected board state
         :param exits: the projected list of exits made
         :return: scaled value of the number of pieces
         """
         numpieces = self.find_numpieces(player, state)
         if numpieces != 0:
-            ratio = (WINNING_EXITS - exits[PLAYER_LIST.index(player)]) / self.find_numpieces(player, state)
+            ratio = (WINNING_EXITS - exits[player]) / numpieces
         else:
-            ratio = (WINNING_EXITS - exits[PLAYER_LIST.index(player)])
+            ratio = (WINNING_EXITS - exits[player])
         if (1 - abs(1 - ratio)) <= 0:
             return 0
         return (1 - abs(1 - ratio)) * PIECE_SCALE
@@ -538,16 +916,17 @@ class ExamplePlayer:
         # criteria in order: distance, exit and number of pieces
         weights = [4, 3, 2]
         captured_weight = 1
-        for player in PLAYER_LIST:
+        for player in range(len(PLAYER_LIST)):
             # adjust weighting according to the number of pieces left
-            if self.find_numpieces(player, state) + exits[PLAYER_LIST.index(player)] < 4:
+            numpieces = self.find_numpieces(player, state)
+            if numpieces + exits[player] < WINNING_EXITS:
                 captured_weight = 3
                 weights = [2, 3, 5]
-            elif self.find_numpieces(player, state) + exits[PLAYER_LIST.index(player)] > 5:
+            elif numpieces + exits[player] > 5:
                 weights = [2, 2, 4]
             # evaluate criteria
-            distance_eval = (MAX_DISTANCE - self.exit_distances(state, player)) * DIST_SCALE
-            exits_eval = exits[PLAYER_LIST.index(player)] * EXIT_SCALE
+            distance_eval = (MAX_DISTANCE - self.race_distance(state, player, exits)) * DIST_SCALE
+            exits_eval = exits[player] * EXIT_SCALE
             piece_eval = self.piece_eval(player, state, exits)
             captured = self.find_captors(state, player)
             # add up the criteria values, adjusted for weight
@@ -556,33 +935,322 @@ class ExamplePlayer:
             evals.append(player_val)
         return evals
 
+    def batch_evaluation(self, masks, exits):
+        """
+        Evaluates many board states in one vectorised pass, giving the same
+        values as evaluation does for each of them (the race tablebase's
+        distances for racing colours included, which are looked up row by row).
+        :param masks: an (n, 3) array of the colour masks of each state
+        :param exits: an (n, 3) array of the exits made at each state
+        :return: an (n, 3) array of the state evaluation for each player
+        """
+        # (n, 3, 37) occupancy of every hex by every colour
+        occupancy = ((masks[:, :, None] & HEX_BITS) != 0).astype(np.float64)
+        counts = occupancy.sum(axis=2)
+        dist_sums = (occupancy * EXIT_DISTANCE_ARRAY).sum(axis=2)
+        # adjacent pieces of each colour around every hex, then the enemy pieces
+        # adjacent to each colour's pieces
+        adjacent = occupancy @ ADJACENCY_ARRAY
+        enemies = adjacent.sum(axis=1, keepdims=True) - adjacent
+        captured = (occupancy * enemies).sum(axis=2)
+        # evaluate criteria
+        with np.errstate(divide='ignore', invalid='ignore'):
+            average = np.where(counts > 0, dist_sums / counts, MAX_DISTANCE / 2)
+            ratio = np.where(counts > 0, (WINNING_EXITS - exits) / counts, WINNING_EXITS - exits)
+        # where a colour is racing and the race tablebase covers its pieces,
+        # its exact distance replaces the average, as in race_distance
+        if self.tablebase is not None:
+            needed = WINNING_EXITS - exits
+            covered = ((needed > 0) & (needed <= counts) & (counts <= self.tablebase.max_pieces)
+                       & (captured == 0))
+            for row, player in zip(*np.nonzero(covered)):
+                row_masks = [int(mask) for mask in masks[row]]
+                mask = row_masks[player]
+                if ahead_of(mask, (row_masks[0] | row_masks[1] | row_masks[2]) & ~mask, player):
+                    average[row, player] = self.tablebase_distance(player, mask, int(needed[row, player]))
+        distance_eval = (MAX_DISTANCE - average) * DIST_SCALE
+        exits_eval = exits * EXIT_SCALE
+        piece_eval = np.maximum(1 - np.abs(1 - ratio), 0) * PIECE_SCALE
+        # the weights carry over from one player to the next, as in evaluation
+        n = len(masks)
+        weights = np.tile(np.array([4.0, 3.0, 2.0]), (n, 1))
+        captured_weight = np.ones(n)
+        evals = np.empty((n, len(PLAYER_LIST)))
+        for player in range(len(PLAYER_LIST)):
+            remaining = counts[:, player] + exits[:, player]
+            few = remaining < WINNING_EXITS
+            many = ~few & (remaining > 5)
+            captured_weight = np.where(few, 3.0, captured_weight)
+            weights = np.where(few[:, None], [2.0, 3.0, 5.0], weights)
+            weights = np.where(many[:, None], [2.0, 2.0, 4.0], weights)
+            evals[:, player] = (weights[:, 0] * distance_eval[:, player] + weights[:, 1] * exits_eval[:, player]
+                                + weights[:, 2] * piece_eval[:, player] + captured_weight * captured[:, player])
+        return evals
+
+    def evaluate_children(self, state, player, moves, exits):
+        """
+        Evaluates the states reached by each of a player's actions together.
+        :param state: the board state, which is modified and restored
+        :param player: the colour index of the player taking action
+        :param moves: the list of action tuples
+        :param exits: the list of exits made, which is modified and restored
+        :return: an (n_moves, 3) array of the evaluation of each resulting state
+        """
+        masks = np.empty((len(moves), len(PLAYER_LIST)), dtype=np.uint64)
+        child_exits = np.empty((len(moves), len(PLAYER_LIST)), dtype=np.float64)
+        for child, move in enumerate(moves):
+            undo = self.make_move(state, player, move, exits)
+            masks[child] = state.masks
+            child_exits[child] = exits
+            self.unmake_move(state, player, move, exits, undo)
+        return self.batch_evaluation(masks, child_exits)
+
     def maxn(self, state, player, depth, exits):
         """
         Runs the maxn algorithm, derived from pseudocode provided to students of COMP30024 by Matt Farrugia
         :param state: the state to be evaluated
-        :param player: the player aiming to maximise its states
+        :param player: the colour index of the player aiming to maximise its states
         :param depth: the current depth being looked at
         :param exits: the number of exits made at this state
         :return: a tuple containing the evaluation, as well as the best action to take
         """
-        tmp_exits = exits.copy()
-        player_index = PLAYER_LIST.index(player)
+        self.check_time()
         # check if this is a cutoff state
-        if self.should_cutoff(depth, tmp_exits):
-            return (self.evaluation(state, tmp_exits), None)
+        if self.should_cutoff(depth, exits):
+            if self.QUIESCENCE and max(exits) < WINNING_EXITS:
+                self.quiescence_left = QUIESCENCE_NODES
+                return (self.maxn_quiescence(state, player, exits), None)
+            return (self.evaluation(state, exits), None)
+        # reuse the result for this position if it was searched deep enough already
+        remaining = self.cutoff_depth - depth
+        key = state.key ^ SIDE_KEYS[player]
+        entry = self.table.probe(key)
+        first_move = None
+        if entry is not None:
+            if entry[ENTRY_DEPTH] >= remaining:
+                return (entry[ENTRY_VALUE], entry[ENTRY_MOVE])
+            first_move = entry[ENTRY_MOVE]
         v_max = [-math.inf, -math.inf, -math.inf]
-        best_action = None
-        # generate the next states
-        for next_state in self.generate_next_states(state, player):
-            # keep track of any exits made in projected state
-            action_coords = self.state_diff(state, next_state)
-            if action_coords[0] is not None and action_coords[1] is None:
-                tmp_exits[player_index] += 1
-            # evaluate projected state
-            next_v = self.maxn(next_state, self.next_player(player), depth + 1, tmp_exits)[0]
+        best_move = None
+        next_player = self.next_player(player)
+        # maxn cannot prune, so only the previous best move is brought forward
+        moves = promote(self.generate_moves(state, player), first_move)
+        # at the frontier, score every child leaf in one vectorised pass
+        if self.BATCH_LEAVES and remaining == 1:
+            self.nodes += len(moves)
+            scores = self.evaluate_children(state, player, moves, exits)
+            best = int(np.argmax(scores[:, player]))
+            v_max = scores[best].tolist()
+            self.table.store(key, remaining, v_max, moves[best])
+            return (v_max, moves[best])
+        for move in moves:
+            # apply the action, evaluate the projected state, then take it back
+            undo = self.make_move(state, player, move, exits)
+            next_v = self.maxn(state, next_player, depth + 1, exits)[0]
+            self.unmake_move(state, player, move, exits, undo)
             # if this is the best outcome so far
-            if next_v[player_index] > v_max[player_index]:
+            if next_v[player] > v_max[player]:
                 v_max = next_v
-                best_action = self.format_move(action_coords[0], action_coords[1])
-            tmp_exits = exits.copy()
-        return (v_max, best_action)
\ No newline at end of file
+                best_move = move
+        self.table.store(key, remaining, v_max, best_move)
+        return (v_max, best_move)
+
+    def probe_bounds(self, key, remaining, alpha, beta):
+        """
+        Looks a position up in the transposition table for an alpha-beta
+        search (paranoid or BRS).
+        :param key: the position's key, side to move included
+        :param remaining: the depth the node still has to search
+        :param alpha: the score we are already guaranteed
+        :param beta: the score the other players can already hold us to
+        :return: a (value, move) result if the stored entry decides the node,
+        or None, and the stored move to search first, or None
+        """
+        entry = self.table.probe(key)
+        if entry is None:
+            return None, None
+        if entry[ENTRY_DEPTH] >= remaining:
+            value = entry[ENTRY_VALUE]
+            flag = entry[ENTRY_FLAG]
+            if (flag == EXACT or (flag == LOWER_BOUND and value >= beta)
+                    or (flag == UPPER_BOUND and value <= alpha)):
+                return (value, entry[ENTRY_MOVE]), entry[ENTRY_MOVE]
+        return None, entry[ENTRY_MOVE]
+
+    def store_bounds(self, key, remaining, value, move, alpha, beta):
+        """
+        Stores an alpha-beta search result (paranoid or BRS), flagged by
+        where it fell relative to the node's original window.
+        :param key: the position's key, side to move included
+        :param remaining: the depth the node searched
+        :param value: the node's value
+        :param move: the best move found
+        :param alpha: alpha when the node was entered
+        :param beta: beta when the node was entered
+        """
+        if value <= alpha:
+            flag = UPPER_BOUND
+        elif value >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.table.store(key, remaining, value, move, flag)
+
+    def paranoid(self, state, player, depth, exits, alpha, beta):
+        """
+        Runs a paranoid alpha-beta search: we maximise our own evaluation, and
+        both other players are assumed to work together to minimise it.
+        :param state: the state to be evaluated
+        :param player: the colour index of the player to move
+        :param depth: the current depth being looked at
+        :param exits: the number of exits made at this state
+        :param alpha: the score we are already guaranteed
+        :param beta: the score the other players can already hold us to
+        :return: a tuple containing our evaluation, as well as the best action to take
+        """
+        self.check_time()
+        me = self.colour_index
+        # check if this is a cutoff state
+        if self.should_cutoff(depth, exits):
+            if self.QUIESCENCE and max(exits) < WINNING_EXITS:
+                self.quiescence_left = QUIESCENCE_NODES
+                return (self.paranoid_quiescence(state, player, exits, alpha, beta), None)
+            return (self.evaluation(state, exits)[me], None)
+        # reuse the result for this position if it is good enough to decide this node
+        remaining = self.cutoff_depth - depth
+        key = state.key ^ SIDE_KEYS[player]
+        decided, first_move = self.probe_bounds(key, remaining, alpha, beta)
+        if decided is not None:
+            return decided
+        original_alpha = alpha
+        original_beta = beta
+        maximising = player == me
+        v_best = -math.inf if maximising else math.inf
+        best_move = None
+        next_player = self.next_player(player)
+        moves = self.order_moves(state, player, self.generate_moves(state, player), first_move, depth)
+        for move_number, move in enumerate(moves):
+            # apply the action, evaluate the projected state, then take it back
+            undo = self.make_move(state, player, move, exits)
+            next_v = self.paranoid(state, next_player, depth + 1, exits, alpha, beta)[0]
+            self.unmake_move(state, player, move, exits, undo)
+            if maximising:
+                if next_v > v_best:
+                    v_best = next_v
+                    best_move = move
+                    alpha = max(alpha, v_best)
+            elif next_v < v_best:
+                v_best = next_v
+                best_move = move
+                beta = min(beta, v_best)
+            # the other side will never allow this position
+            if alpha >= beta:
+                self.orderer.record_cutoff(state, player, move, depth, remaining, move_number)
+                break
+        self.store_bounds(key, remaining, v_best, best_move, original_alpha, original_beta)
+        return (v_best, best_move)
+
+
+    def brs(self, state, depth, exits, alpha, beta):
+        """
+        Runs Best-Reply Search: our turns alternate with a single layer in
+        which only the strongest reply of either opponent is played, while
+        the other opponent stands still. This keeps the tree two-sided so
+        that alpha-beta pruning applies, with a ply being one of our actions
+        or one opponent reply.
+        :param state: the state to be evaluated
+        :param depth: the current depth being looked at; even depths are our turns
+        :param exits: the number of exits made at this state
+        :param alpha: the score we are already guaranteed
+        :param beta: the score the opponents can already hold us to
+        :return: a tuple containing our evaluation, as well as the best
+        (colour index, action) pair to take
+        """
+        self.check_time()
+        me = self.colour_index
+        # check if this is a cutoff state
+        if self.should_cutoff(depth, exits):
+            if self.QUIESCENCE and max(exits) < WINNING_EXITS:
+                self.quiescence_left = QUIESCENCE_NODES
+                return (self.brs_quiescence(state, depth, exits, alpha, beta), None)
+            return (self.evaluation(state, exits)[me], None)
+        maximising = depth % 2 == 0
+        # opponent reply layers are stored under the next player's side key
+        remaining = self.cutoff_depth - depth
+        key = state.key ^ SIDE_KEYS[me if maximising else self.next_player(me)]
+        decided, first_move = self.probe_bounds(key, remaining, alpha, beta)
+        if decided is not None:
+            return decided
+        original_alpha = alpha
+        original_beta = beta
+        v_best = -math.inf if maximising else math.inf
+        best_move = None
+        for move_number, (colour, move) in enumerate(self.brs_moves(state, depth, exits, first_move)):
+            # apply the action, evaluate the projected state, then take it back
+            undo = self.make_move(state, colour, move, exits)
+            next_v = self.brs(state, depth + 1, exits, alpha, beta)[0]
+            self.unmake_move(state, colour, move, exits, undo)
+            if maximising:
+                if next_v > v_best:
+                    v_best = next_v
+                    best_move = (colour, move)
+                    alpha = max(alpha, v_best)
+            elif next_v < v_best:
+                v_best = next_v
+                best_move = (colour, move)
+                beta = min(beta, v_best)
+            # the other side will never allow this position
+            if alpha >= beta:
+                self.orderer.record_cutoff(state, colour, move, depth, remaining, move_number)
+                break
+        self.store_bounds(key, remaining, v_best, best_move, original_alpha, original_beta)
+        return (v_best, best_move)
+
+    def brs_moves(self, state, depth, exits, first_move):
+        """
+        Lists the (colour index, action) pairs available in one layer of
+        Best-Reply Search, best candidates first.
+        :param state: the board state
+        :param depth: the depth of the layer; even depths are our turns
+        :param exits: the list of exits made
+        :param first_move: the (colour index, action) pair to search first, or None
+        :return: the ordered list of pairs
+        """
+        me = self.colour_index
+        maximising = depth % 2 == 0
+        if maximising:
+            colours = [me]
+        else:
+            colours = [self.next_player(me), self.next_player(self.next_player(me))]
+        pairs = []
+        for colour in colours:
+            # a finished opponent takes no part in the replies
+            if exits[colour] >= WINNING_EXITS:
+                continue
+            for move in self.generate_moves(state, colour):
+                if move != PASS_MOVE or maximising:
+                    pairs.append((colour, move))
+        # the opponents only pass if neither of them can do anything else
+        if not pairs:
+            pairs.append((colours[0], PASS_MOVE))
+        return self.orderer.order_pairs(state, pairs, first_move, depth)
+
+class ParanoidPlayer(ExamplePlayer):
+    """
+    ExamplePlayer searching with paranoid alpha-beta instead of maxn.
+    """
+    SEARCH_MODE = PARANOID
+
+
+class BRSPlayer(ExamplePlayer):
+    """
+    ExamplePlayer searching with Best-Reply Search instead of maxn.
+    """
+    SEARCH_MODE = BRS
+
+
+class PonderingPlayer(ExamplePlayer):
+    """
+    ExamplePlayer that ponders the opponents' replies after each of its actions.
+    """
+    PONDER = True
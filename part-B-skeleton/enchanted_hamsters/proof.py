@@ -0,0 +1,179 @@
+"""
+Proof-number search for forced wins.
+
+Late in a game a colour can often force its last exits in a few turns,
+whatever the others do, along a line too long for the heuristic search to
+see. ProofSearch decides the question "does this colour make its winning
+exit before anyone else, within a number of its own turns" by best-first
+proof-number search: the colour's own turns are OR nodes (one good action
+is enough) and both opponents' turns are AND nodes (every action has to be
+answered), so a proof holds however the opponents play, together or not.
+
+Each node has a proof number, the fewest leaves that still have to be proved
+to prove it, and a disproof number, the same for disproving it. The search
+keeps expanding the most-proving leaf, the one on which both numbers of the
+root depend, until the root is solved or the node budget runs out. Nodes past
+the turn horizon, or that need more exits than the colour has turns left,
+are disproved straight away, which keeps the tree finite. The horizon grows
+one turn at a time, so the win found is always one of the shortest.
+"""
+import math
+
+from enchanted_hamsters.geometry import PLAYER_LIST, WINNING_EXITS
+
+# nodes the search may create, and own turns it may look ahead, by default
+DEFAULT_PROOF_NODES = 5000
+DEFAULT_PROOF_TURNS = 3
+
+# the proof or disproof number of a solved node
+PROOF_INFINITY = math.inf
+
+
+class ProofNode:
+    """
+    A position in the proof tree, reached by one action from its parent.
+    """
+    __slots__ = ('move', 'parent', 'player', 'state', 'exits', 'turns',
+                 'children', 'proof', 'disproof')
+
+    def __init__(self, move, parent, player, state, exits, turns):
+        """
+        :param move: the action tuple leading here from the parent, or None at the root
+        :param parent: the parent node, or None at the root
+        :param player: the colour index of the player to move here
+        :param state: the board state here
+        :param exits: the list of exits made
+        :param turns: the turns the proving colour has left, including this one
+        """
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.state = state
+        self.exits = exits
+        self.turns = turns
+        self.children = None
+        self.proof = 1
+        self.disproof = 1
+
+
+class ProofSearch:
+    """
+    Proves or disproves that a colour wins by force, using the rules of an
+    enchanted_hamsters player.
+    """
+    def __init__(self, rules, colour, max_nodes=DEFAULT_PROOF_NODES, max_turns=DEFAULT_PROOF_TURNS):
+        """
+        :param rules: the ExamplePlayer whose generate_moves and make_move are used
+        :param colour: the colour index of the player trying to win
+        :param max_nodes: the most nodes to create before giving up
+        :param max_turns: the most turns of its own the colour may take to win
+        """
+        self.rules = rules
+        self.colour = colour
+        self.max_nodes = max_nodes
+        self.max_turns = max_turns
+        self.nodes = 0
+
+    def prove(self, state, exits, player):
+        """
+        Searches for a forced win from a position.
+        :param state: the board state
+        :param exits: the list of exits made
+        :param player: the colour index of the player to move
+        :return: True and the winning action if the win is proved (the action
+        is None unless the proving colour is to move), False and None if it is
+        disproved within the turn limit, and None and None if the node budget
+        ran out first
+        """
+        self.nodes = 0
+        # the shortest win is proved first, so following the proofs turn
+        # after turn always gets closer to the winning exit
+        for turns in range(WINNING_EXITS - exits[self.colour], self.max_turns + 1):
+            root = ProofNode(None, None, player, state.copy(), list(exits), turns)
+            self.nodes += 1
+            self.set_numbers(root)
+            while root.proof and root.disproof and self.nodes < self.max_nodes:
+                node = self.most_proving(root)
+                self.expand(node)
+                self.update_ancestors(node)
+            if root.proof == 0:
+                move = None
+                if root.player == self.colour:
+                    move = next(child.move for child in root.children if child.proof == 0)
+                return True, move
+            if root.disproof != 0:
+                return None, None
+        return False, None
+
+    def set_numbers(self, node):
+        """
+        Gives a new node its proof and disproof numbers.
+        :param node: the node, whose children have not been generated
+        """
+        exits = node.exits
+        if exits[self.colour] >= WINNING_EXITS:
+            node.proof, node.disproof = 0, PROOF_INFINITY
+        # someone else won first, or the colour can no longer make its exits in time
+        elif (max(exits) >= WINNING_EXITS
+              or WINNING_EXITS - exits[self.colour] > node.turns
+              or not node.state.counts[self.colour]):
+            node.proof, node.disproof = PROOF_INFINITY, 0
+
+    def most_proving(self, node):
+        """
+        Follows the children that most affect the root down to a leaf.
+        :param node: the root
+        :return: the leaf to expand
+        """
+        while node.children:
+            if node.player == self.colour:
+                node = min(node.children, key=lambda child: child.proof)
+            else:
+                node = min(node.children, key=lambda child: child.disproof)
+        return node
+
+    def expand(self, node):
+        """
+        Generates the children of a leaf, stopping early once one settles it.
+        :param node: the leaf
+        """
+        colour = node.player
+        or_node = colour == self.colour
+        turns = node.turns - 1 if or_node else node.turns
+        next_player = (colour + 1) % len(PLAYER_LIST)
+        node.children = []
+        for move in self.rules.generate_moves(node.state, colour):
+            state = node.state.copy()
+            exits = list(node.exits)
+            self.rules.make_move(state, colour, move, exits)
+            child = ProofNode(move, node, next_player, state, exits, turns)
+            self.set_numbers(child)
+            node.children.append(child)
+            self.nodes += 1
+            if (child.proof if or_node else child.disproof) == 0:
+                break
+        # only leaves are ever expanded, so the position is not needed again
+        node.state = None
+        self.set_node_numbers(node)
+
+    def set_node_numbers(self, node):
+        """
+        Recomputes an expanded node's numbers from its children's.
+        :param node: the node
+        """
+        proofs = [child.proof for child in node.children]
+        disproofs = [child.disproof for child in node.children]
+        if node.player == self.colour:
+            node.proof, node.disproof = min(proofs), sum(disproofs)
+        else:
+            node.proof, node.disproof = sum(proofs), min(disproofs)
+
+    def update_ancestors(self, node):
+        """
+        Passes a leaf's new numbers up to the root.
+        :param node: the expanded leaf
+        """
+        node = node.parent
+        while node is not None:
+            self.set_node_numbers(node)
+            node = node.parent
@@ -0,0 +1,224 @@
+"""
+Exact play for colours that can no longer interact with anyone.
+
+A colour is racing once every one of its pieces is further along its own
+direction of travel than every enemy piece, and none of its pieces is next to
+an enemy piece. From then on nobody can capture or block it without turning
+back, and its best play is simply the fastest way to make its remaining
+exits: a single-agent problem that does not need maxn at all.
+
+RaceSolver finds the fewest actions (moves, jumps over its own pieces, and
+exits) a colour needs. Positions within the race tablebase are looked up,
+and larger ones are solved by A* over sets of the colour's pieces, with the
+admissible heuristic that a piece d spaces from the exits needs at least
+ceil(d / 2) jumps and an exit. A* is run once per turn, and the move played
+is the first step of its path; it gives up at the turn's deadline. Everything is done in red's frame (see
+symmetry), so results are shared between colours.
+"""
+import heapq
+import time
+
+from enchanted_hamsters.bitboard import mask_indices, popcount
+from enchanted_hamsters.geometry import (
+    EXIT_DISTANCES, EXIT_MASKS, HEXES, NUM_HEXES, RED_FRAME_INDEX)
+from enchanted_hamsters.symmetry import INVERSE_ROTATIONS, rotate_mask
+from enchanted_hamsters.tablebase import ENTRY_BYTES, neighbour_sets
+
+# how far along its direction of travel each space is for each colour
+PROGRESS = [[HEXES[frame[index]][0] for index in range(NUM_HEXES)] for frame in RED_FRAME_INDEX]
+
+# the fewest actions a red piece on each space needs to exit
+EXIT_BOUNDS = [(distance + 1) // 2 + 1 for distance in EXIT_DISTANCES[0]]
+
+# the most sets A* may expand before the race is left to the search, and how
+# many it expands between looks at the clock
+RACE_NODE_LIMIT = 20000
+DEADLINE_CHECK_INTERVAL = 256
+
+
+def in_race(state, colour):
+    """
+    Determines if a colour's pieces have passed every enemy piece.
+    :param state: the board state
+    :param colour: the colour index of the player
+    :return: True if no enemy piece can reach the colour's pieces any more
+    """
+    mask = state.masks[colour]
+    # adjacent pieces can still capture each other
+    if not mask or state.threats[colour]:
+        return False
+    return ahead_of(mask, state.occupied() & ~mask, colour)
+
+
+def ahead_of(mask, enemies, colour):
+    """
+    Determines if every piece of a colour is further along its direction of
+    travel than every enemy piece.
+    :param mask: the mask of the colour's pieces, which must not be empty
+    :param enemies: the mask of every other colour's pieces
+    :param colour: the colour index of the player
+    """
+    if not enemies:
+        return True
+    progress = PROGRESS[colour]
+    return (min(progress[index] for index in mask_indices(mask))
+            > max(progress[index] for index in mask_indices(enemies)))
+
+
+def race_bound(mask, needed):
+    """
+    A lower bound on the actions needed to make some exits from a red set.
+    :param mask: the set of red pieces, in red's frame
+    :param needed: the number of exits still to make
+    """
+    return sum(sorted(EXIT_BOUNDS[index] for index in mask_indices(mask))[:needed])
+
+
+class RaceSolver:
+    """
+    Solves races exactly, remembering every set it has solved.
+    """
+    def __init__(self, tablebase=None):
+        """
+        :param tablebase: a RaceTablebase to look small sets up in, or None
+        """
+        self.tablebase = tablebase
+        self.solved = {}
+
+    def race_length(self, colour, mask, needed):
+        """
+        Finds the fewest actions a colour needs to make its remaining exits.
+        :param colour: the colour index of the player
+        :param mask: the mask of the colour's pieces
+        :param needed: the number of exits still to make
+        :return: the number of actions, or None if the race was too big to solve
+        """
+        if needed <= 0:
+            return 0
+        return self.solve(rotate_mask(mask, colour), needed)
+
+    def solve(self, mask, needed):
+        """
+        Finds the fewest actions needed to make some exits from a red set.
+        :param mask: the set of red pieces, in red's frame
+        :param needed: the number of exits still to make
+        :return: the number of actions, or None if the race was too big to solve
+        """
+        if needed <= 0:
+            return 0
+        # without enough pieces the exits can never be made
+        if popcount(mask) < needed:
+            return None
+        key = (mask, needed)
+        if key in self.solved:
+            return self.solved[key]
+        length = None
+        if self.tablebase is not None:
+            length = self.tablebase.probe(0, mask, needed)
+        if length is None:
+            length = self.search(mask, needed)[0]
+        self.solved[key] = length
+        return length
+
+    def covers(self, mask, needed):
+        """
+        Determines if the tablebase answers a red set and all the sets one
+        action away from it.
+        :param mask: the set of red pieces, in red's frame
+        :param needed: the number of exits still to make
+        """
+        return (self.tablebase is not None and needed <= ENTRY_BYTES
+                and popcount(mask) <= self.tablebase.max_pieces)
+
+    def search(self, mask, needed, deadline=None):
+        """
+        Runs A* from a red set to any set with the exits made.
+        :param mask: the set of red pieces, in red's frame
+        :param needed: the number of exits still to make
+        :param deadline: the process_time() value to give up at, or None
+        :return: the number of actions and the (set, exits needed) pair the
+        first of them leads to, or None and None if RACE_NODE_LIMIT or the
+        deadline was reached
+        """
+        if popcount(mask) < needed:
+            return None, None
+        exit_mask = EXIT_MASKS[0]
+        start = (mask, needed)
+        costs = {start: 0}
+        # the child of the start each set was first reached through
+        first_steps = {start: None}
+        frontier = [(race_bound(mask, needed), 0, mask, needed)]
+        expanded = 0
+        while frontier:
+            estimate, cost, mask, needed = heapq.heappop(frontier)
+            if needed == 0:
+                return cost, first_steps[(mask, needed)]
+            parent = (mask, needed)
+            if costs[parent] < cost:
+                continue
+            expanded += 1
+            if expanded > RACE_NODE_LIMIT:
+                return None, None
+            if (deadline is not None and not expanded % DEADLINE_CHECK_INTERVAL
+                    and time.process_time() > deadline):
+                return None, None
+            children = [(child, needed) for child in neighbour_sets(mask)]
+            children += [(mask & ~(1 << piece), needed - 1) for piece in mask_indices(mask & exit_mask)]
+            for child in children:
+                if costs.get(child, cost + 2) > cost + 1:
+                    costs[child] = cost + 1
+                    first_steps[child] = first_steps[parent] or child
+                    heapq.heappush(frontier, (cost + 1 + race_bound(*child), cost + 1) + child)
+        return None, None
+
+    def best_move(self, state, colour, needed, deadline=None):
+        """
+        Finds the action that finishes a race fastest.
+        :param state: the board state
+        :param colour: the colour index of the racing player
+        :param needed: the number of exits the player still has to make
+        :param deadline: the process_time() value to give up at, or None
+        :return: an (action type, old index, new index, jumped index) tuple, or
+        None if the race was too big to solve in time
+        """
+        mask = state.masks[colour]
+        red_mask = rotate_mask(mask, colour)
+        if not self.covers(red_mask, needed):
+            # one search from the current set, whose path starts with the move
+            length, step = self.search(red_mask, needed, deadline)
+            if step is None:
+                return None
+            return self.step_move(state, colour, red_mask, step)
+        # every set one action away is a single tablebase probe
+        best_move = None
+        best_length = None
+        for piece in state.exits(colour):
+            length = self.race_length(colour, mask & ~(1 << piece), needed - 1)
+            if length is not None and (best_length is None or length < best_length):
+                best_move = ("EXIT", piece, None, None)
+                best_length = length
+        for piece in mask_indices(mask):
+            for move in state.move_actions(piece):
+                length = self.race_length(colour, mask & ~(1 << piece) | 1 << move[2], needed)
+                if length is not None and (best_length is None or length < best_length):
+                    best_move = move
+                    best_length = length
+        return best_move
+
+    def step_move(self, state, colour, red_mask, step):
+        """
+        Turns the first step of a solved race back into an action.
+        :param state: the board state
+        :param colour: the colour index of the racing player
+        :param red_mask: the player's pieces, in red's frame
+        :param step: the (set, exits needed) pair the action leads to, in red's frame
+        :return: the action tuple, or None if it is not legal on the real board
+        """
+        rotation = INVERSE_ROTATIONS[colour]
+        child_mask = step[0]
+        old_index = rotation[mask_indices(red_mask & ~child_mask)[0]]
+        if not child_mask & ~red_mask:
+            return ("EXIT", old_index, None, None)
+        new_index = rotation[mask_indices(child_mask & ~red_mask)[0]]
+        # enemy pieces were left out of the search, so check the move is open
+        return next((move for move in state.move_actions(old_index) if move[2] == new_index), None)
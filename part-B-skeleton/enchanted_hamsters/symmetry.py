@@ -0,0 +1,114 @@
+"""
+Rotational symmetry of Chexers positions.
+
+Turning the board by 120 degrees carries red's starts and exits onto blue's,
+blue's onto green's and green's onto red's (see RED_FRAME_INDEX). A position
+turned so that the colour to move takes red's place, with the other colours
+relabelled along with it, is played exactly like the original, so every
+position has a canonical form with red to move. Tables keyed by the
+canonical form serve all three colours from one entry.
+
+The transposition table keeps its incrementally updated keys: rotated copies
+of a position almost never meet inside one game's search, and a search's
+paranoid and BRS values only mean anything for its own root colour.
+"""
+from enchanted_hamsters.bitboard import mask_indices
+from enchanted_hamsters.geometry import NUM_HEXES, PLAYER_LIST, RED_FRAME_INDEX
+from enchanted_hamsters.zobrist import PIECE_KEYS, SIDE_KEYS, exit_key
+
+# bits of a mask rotated in one table lookup
+CHUNK_BITS = 8
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+NUM_CHUNKS = (NUM_HEXES + CHUNK_BITS - 1) // CHUNK_BITS
+
+# the index each space takes when the board is turned so that a colour plays
+# as red, and the index it came from
+ROTATIONS = RED_FRAME_INDEX
+INVERSE_ROTATIONS = [[0] * NUM_HEXES for rotation in ROTATIONS]
+for _turn, _rotation in enumerate(ROTATIONS):
+    for _index, _rotated in enumerate(_rotation):
+        INVERSE_ROTATIONS[_turn][_rotated] = _index
+
+
+def _chunk_tables(rotation):
+    """
+    Tabulates the rotated mask of every value of every chunk of a mask.
+    :param rotation: the index each space takes
+    """
+    tables = []
+    for chunk in range(NUM_CHUNKS):
+        table = []
+        for value in range(1 << CHUNK_BITS):
+            rotated = 0
+            for bit in range(CHUNK_BITS):
+                index = chunk * CHUNK_BITS + bit
+                if (value >> bit) & 1 and index < NUM_HEXES:
+                    rotated |= 1 << rotation[index]
+            table.append(rotated)
+        tables.append(table)
+    return tables
+
+
+# ROTATION_CHUNKS[turn][chunk][value] is the rotated mask of one chunk
+ROTATION_CHUNKS = [_chunk_tables(rotation) for rotation in ROTATIONS]
+
+
+def rotate_mask(mask, turn):
+    """
+    Turns a set of spaces so that a colour's spaces become red's.
+    :param mask: the mask of the spaces
+    :param turn: the colour index that takes red's place
+    """
+    rotated = 0
+    for table in ROTATION_CHUNKS[turn]:
+        rotated |= table[mask & CHUNK_MASK]
+        mask >>= CHUNK_BITS
+    return rotated
+
+
+def rotate_position(masks, exits, turn):
+    """
+    Turns a position so that a colour takes red's place, relabelling the
+    other colours with it.
+    :param masks: the masks of each colour's pieces
+    :param exits: the list of exits made by each colour
+    :param turn: the colour index that takes red's place
+    :return: the rotated masks and exits
+    """
+    colours = len(PLAYER_LIST)
+    rotated_masks = [rotate_mask(masks[(colour + turn) % colours], turn) for colour in range(colours)]
+    rotated_exits = [exits[(colour + turn) % colours] for colour in range(colours)]
+    return rotated_masks, rotated_exits
+
+
+def rotate_move(move, turn, inverse=False):
+    """
+    Turns the spaces of an action along with its board.
+    :param move: an (action type, old index, new index, jumped index) tuple
+    :param turn: the colour index that takes red's place
+    :param inverse: True to turn a canonical action back to the original board
+    """
+    if move is None or move[0] == "PASS":
+        return move
+    rotation = (INVERSE_ROTATIONS if inverse else ROTATIONS)[turn]
+    action, old_index, new_index, jumped = move
+    return (action, rotation[old_index],
+            None if new_index is None else rotation[new_index],
+            None if jumped is None else rotation[jumped])
+
+
+def canonical_key(state, exits, colour):
+    """
+    Finds the key of a position's canonical form.
+    :param state: the board state
+    :param exits: the list of exits made by each colour
+    :param colour: the colour index of the player to move
+    :return: the Zobrist key of the position turned so that red is to move
+    """
+    masks, rotated_exits = rotate_position(state.masks, exits, colour)
+    key = exit_key(rotated_exits) ^ SIDE_KEYS[0]
+    for rotated, mask in enumerate(masks):
+        keys = PIECE_KEYS[rotated]
+        for index in mask_indices(mask):
+            key ^= keys[index]
+    return key
@@ -0,0 +1,241 @@
+"""
+Race tablebase: the exact number of actions a colour needs to make its
+remaining exits, for every arrangement of up to a few of its pieces.
+
+Chexers has three players and no zero-sum outcome to back up, so the table
+solves the part of the endgame that can be solved exactly: one colour racing
+its pieces off the board with nobody in the way. For a set of pieces S and a
+number of exits j, the distance d_j(S) counts every move, jump (over its own
+pieces) and exit until j pieces have left. It is built by retrograde
+analysis, one piece count at a time: exiting a piece from S reaches a set
+with one piece fewer whose distances are already known, and moves and jumps
+are reversible, so within a piece count the distances spread outwards from
+those exits as a shortest path search.
+
+The three colours are rotations of each other (see symmetry), so only red's
+distances are stored, and the other colours' pieces are rotated into red's
+frame before probing.
+
+File layout: the MAGIC bytes, one byte giving the largest piece count, then
+for each piece count k from 0 up, one ENTRY_BYTES entry per k-piece set in
+colex order (the order of combinatorial_rank). Entry byte j - 1 holds d_j,
+or UNKNOWN where j > k.
+
+The file is generated offline, and is not part of the repository:
+    python -m enchanted_hamsters.tablebase [-n PIECES] [-o FILE]
+The player maps the file with mmap, so only the pages it probes are read.
+"""
+import argparse
+import mmap
+import os
+import time
+from itertools import combinations
+
+from enchanted_hamsters.bitboard import mask_indices
+from enchanted_hamsters.geometry import EXIT_MASKS, MOVE_RAYS, NUM_HEXES, WINNING_EXITS
+from enchanted_hamsters.symmetry import rotate_mask
+
+# where the player looks for the table by default
+DEFAULT_TABLEBASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'race.tb')
+
+# the largest number of pieces of one colour the generator covers by default
+DEFAULT_MAX_PIECES = 4
+
+# the most distances stored per set, one for each number of exits still
+# needed to win
+ENTRY_BYTES = WINNING_EXITS
+
+MAGIC = b'CHXRACE1'
+HEADER_BYTES = len(MAGIC) + 1
+
+# entry byte for a distance that does not exist
+UNKNOWN = 255
+
+# probe results remembered before the memo is emptied
+PROBE_CACHE_ENTRIES = 1 << 16
+
+# BINOMIAL[n][r] is n choose r
+BINOMIAL = [[0] * (NUM_HEXES + 1) for n in range(NUM_HEXES + 1)]
+for _n in range(NUM_HEXES + 1):
+    BINOMIAL[_n][0] = 1
+    for _r in range(1, _n + 1):
+        BINOMIAL[_n][_r] = BINOMIAL[_n - 1][_r - 1] + BINOMIAL[_n - 1][_r]
+
+
+def combinatorial_rank(indices):
+    """
+    Numbers a set of hex indices among all sets of the same size.
+    :param indices: the hex indices, lowest first
+    :return: the rank, from 0 to (NUM_HEXES choose len(indices)) - 1
+    """
+    rank = 0
+    for position, index in enumerate(indices):
+        rank += BINOMIAL[index][position + 1]
+    return rank
+
+
+def section_offsets(max_pieces):
+    """
+    Finds where the entries of each piece count start in the file.
+    :param max_pieces: the largest piece count in the file
+    :return: a list of byte offsets, indexed by piece count
+    """
+    offsets = []
+    offset = HEADER_BYTES
+    for pieces in range(max_pieces + 1):
+        offsets.append(offset)
+        offset += BINOMIAL[NUM_HEXES][pieces] * ENTRY_BYTES
+    offsets.append(offset)
+    return offsets
+
+
+def piece_sets(pieces):
+    """
+    Lists every set of a given number of hexes as a mask, in rank order.
+    :param pieces: the number of hexes in each set
+    """
+    sets = sorted(combinations(range(NUM_HEXES), pieces), key=combinatorial_rank)
+    return [sum(1 << index for index in indices) for indices in sets]
+
+
+def neighbour_sets(mask):
+    """
+    Finds the sets reached from a set of red pieces by one move or jump.
+    :param mask: the mask of the pieces
+    """
+    for piece in mask_indices(mask):
+        without = mask & ~(1 << piece)
+        for adjacent, landing in MOVE_RAYS[piece]:
+            if not (mask >> adjacent) & 1:
+                yield without | 1 << adjacent
+            elif landing is not None and not (mask >> landing) & 1:
+                yield without | 1 << landing
+
+
+def solve_section(pieces, previous):
+    """
+    Computes the distances of every set of a given number of red pieces.
+    :param pieces: the number of pieces
+    :param previous: the entries of the sets with one piece fewer, or None for no pieces
+    :return: a list of ENTRY_BYTES-long bytearrays, in rank order
+    """
+    masks = piece_sets(pieces)
+    ranks = {mask: rank for rank, mask in enumerate(masks)}
+    entries = [bytearray([UNKNOWN] * ENTRY_BYTES) for mask in masks]
+    exit_mask = EXIT_MASKS[0]
+    for exits in range(1, min(pieces, ENTRY_BYTES) + 1):
+        # the cheapest way to finish by exiting straight away
+        distances = [UNKNOWN] * len(masks)
+        buckets = [[] for distance in range(UNKNOWN)]
+        for rank, mask in enumerate(masks):
+            best = UNKNOWN
+            for piece in mask_indices(mask & exit_mask):
+                rest = mask & ~(1 << piece)
+                after = 0 if exits == 1 else previous[combinatorial_rank(mask_indices(rest))][exits - 2]
+                best = min(best, after + 1)
+            if best < UNKNOWN:
+                distances[rank] = best
+                buckets[best].append(rank)
+        # spread outwards over moves and jumps, which can always be undone
+        for distance in range(UNKNOWN - 1):
+            for rank in buckets[distance]:
+                if distances[rank] != distance:
+                    continue
+                for neighbour in neighbour_sets(masks[rank]):
+                    other = ranks[neighbour]
+                    if distances[other] > distance + 1:
+                        distances[other] = distance + 1
+                        buckets[distance + 1].append(other)
+        for rank, distance in enumerate(distances):
+            entries[rank][exits - 1] = distance
+    return entries
+
+
+def generate(path, max_pieces=DEFAULT_MAX_PIECES):
+    """
+    Writes a tablebase file.
+    :param path: the file to write
+    :param max_pieces: the largest number of pieces to cover
+    """
+    with open(path, 'wb') as file:
+        file.write(MAGIC + bytes([max_pieces]))
+        previous = None
+        for pieces in range(max_pieces + 1):
+            start = time.process_time()
+            entries = solve_section(pieces, previous)
+            for entry in entries:
+                file.write(entry)
+            print(f"{pieces} pieces: {len(entries)} sets in {time.process_time() - start:.1f}s")
+            previous = entries
+
+
+class RaceTablebase:
+    """
+    A memory-mapped tablebase file.
+    """
+    def __init__(self, path):
+        """
+        :param path: the tablebase file
+        """
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a race tablebase")
+        self.max_pieces = self.data[len(MAGIC)]
+        self.offsets = section_offsets(self.max_pieces)
+        if len(self.data) != self.offsets[-1]:
+            raise ValueError(f"{path} is truncated")
+        # the search probes the same few sets over and over
+        self.cache = {}
+
+    def probe(self, colour, mask, exits):
+        """
+        Looks up how many actions a colour needs to make some exits, with no
+        other pieces on the board.
+        :param colour: the colour index of the pieces
+        :param mask: the mask of the colour's pieces
+        :param exits: the number of exits still to make, from 1 to ENTRY_BYTES
+        :return: the number of actions, or None if the table does not cover the position
+        """
+        key = (mask << 2 | colour) << 3 | exits
+        distance = self.cache.get(key)
+        if distance is not None:
+            return distance
+        indices = list(mask_indices(rotate_mask(mask, colour)))
+        pieces = len(indices)
+        if pieces > self.max_pieces or not 0 < exits <= min(pieces, ENTRY_BYTES):
+            return None
+        offset = self.offsets[pieces] + combinatorial_rank(indices) * ENTRY_BYTES
+        distance = self.data[offset + exits - 1]
+        if len(self.cache) >= PROBE_CACHE_ENTRIES:
+            self.cache.clear()
+        self.cache[key] = distance
+        return distance
+
+    def close(self):
+        self.data.close()
+
+
+def load_tablebase(path=DEFAULT_TABLEBASE_PATH):
+    """
+    Opens a tablebase file, if it has been generated.
+    :param path: the tablebase file
+    :return: the RaceTablebase, or None if there is no file
+    """
+    if not os.path.exists(path):
+        return None
+    return RaceTablebase(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="generate the enchanted_hamsters race tablebase")
+    parser.add_argument('-n', '--pieces', type=int, default=DEFAULT_MAX_PIECES,
+                        help="largest number of pieces of one colour to cover")
+    parser.add_argument('-o', '--output', default=DEFAULT_TABLEBASE_PATH,
+                        help="file to write the tablebase to")
+    args = parser.parse_args()
+    generate(args.output, args.pieces)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Game-clock time management for the enchanted_hamsters player.
+
+The referee charges each player the CPU time (time.process_time) spent inside
+its __init__, action and update methods against one budget for the whole
+game. The TimeManager measures the same thing from the inside, and splits
+what is left of the budget across the turns the game is still expected to
+last.
+
+CPU time spent on our behalf in other processes (search workers) is invisible
+to the referee's timer, so it is charged to the TimeManager explicitly; the
+player then never uses more CPU in total than the budget allows.
+"""
+import time
+
+# the referee's budget when -t is given without a value, in CPU seconds
+DEFAULT_TIME_BUDGET = 60.0
+
+# the referee ends the game as a draw after this many turns per player
+MAX_TURNS = 256
+
+# how long we plan for a game to last, and the fewest turns we ever plan for
+EXPECTED_TURNS = 90
+MIN_REMAINING_TURNS = 20
+
+# part of the budget that is never planned for, to absorb overshoot and the
+# time the referee charges outside our own measurements
+RESERVE_FRACTION = 0.1
+
+# how much more than its share a critical turn may use, and the most of the
+# remaining budget any single turn may use
+CRITICAL_FACTOR = 2.5
+MAX_TURN_FRACTION = 0.2
+
+# the part of a turn's share that may be spent pondering before it
+PONDER_FRACTION = 0.5
+
+
+class TimeManager:
+    """
+    Tracks the CPU time the player has consumed and hands out per-turn
+    budgets. Use it as a context manager around every method the referee
+    times.
+    """
+    def __init__(self, budget=DEFAULT_TIME_BUDGET):
+        """
+        :param budget: the total CPU seconds available for the game
+        """
+        self.budget = budget
+        self.used = 0.0
+        self.turns = 0
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.used += time.process_time() - self._start
+        self._start = None
+
+    def charge(self, seconds):
+        """
+        Counts CPU time used outside this process (by search workers).
+        :param seconds: the CPU seconds used
+        """
+        self.used += seconds
+
+    def elapsed(self):
+        """
+        The CPU time consumed so far, including the call in progress.
+        """
+        if self._start is None:
+            return self.used
+        return self.used + time.process_time() - self._start
+
+    def remaining(self):
+        """
+        The CPU time left to plan with, after keeping back the reserve.
+        """
+        return max(0.0, self.budget * (1 - RESERVE_FRACTION) - self.elapsed())
+
+    def remaining_turns(self):
+        """
+        Estimates how many more turns we will have to play.
+        """
+        expected = max(MIN_REMAINING_TURNS, EXPECTED_TURNS - self.turns)
+        return max(1, min(expected, MAX_TURNS - self.turns))
+
+    def turn_budget(self, critical=False):
+        """
+        Decides how much CPU time to spend on the current turn, and counts the
+        turn as played.
+        :param critical: True if the position deserves more time than usual
+        :return: the number of CPU seconds to spend
+        """
+        remaining = self.remaining()
+        share = remaining / self.remaining_turns()
+        if critical:
+            share *= CRITICAL_FACTOR
+        self.turns += 1
+        return min(share, remaining * MAX_TURN_FRACTION)
+
+    def count_turn(self):
+        """
+        Counts a turn that was played without asking for a budget.
+        """
+        self.turns += 1
+
+    def ponder_budget(self):
+        """
+        Decides how much CPU time to spend pondering during the opponents'
+        turns. The time comes out of the same budget as our own turns, but
+        is not counted as a turn.
+        :return: the number of CPU seconds to spend
+        """
+        return self.remaining() / self.remaining_turns() * PONDER_FRACTION
+
+    def deadline(self, critical=False):
+        """
+        Gives the process_time() value by which the current turn should be
+        decided.
+        :param critical: True if the position deserves more time than usual
+        """
+        return time.process_time() + self.turn_budget(critical)
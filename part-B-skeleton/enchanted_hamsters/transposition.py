@@ -0,0 +1,299 @@
+"""
+Fixed-size transposition table for the enchanted_hamsters searches.
+
+Entries are kept in a preallocated list indexed by the low bits of the
+position key, so the table never grows past the size chosen when it is
+created. The size is derived from a memory cap in megabytes, to keep the
+player inside the referee's --space limit.
+
+Replacement policy: a slot is overwritten when it is empty, was written
+during an earlier search, or holds a result searched no deeper than the new
+one. Otherwise the deeper, current result is kept.
+
+SharedTranspositionTable keeps the same entries packed into a
+multiprocessing.shared_memory block, so that the parallel search workers all
+probe and store into one table. There are no locks: each entry is five 64-bit
+words, the first of which is the position key XORed with the other four. A
+reader recomputes the XOR, and an entry torn by two processes writing at once
+(or by a read during a write) fails the check and is treated as a miss.
+"""
+import struct
+import weakref
+from functools import lru_cache
+from multiprocessing import resource_tracker, shared_memory
+
+# default memory cap for the table, in MB
+DEFAULT_TABLE_MEGABYTES = 16
+
+# rough size of one stored entry in CPython (the entry tuple, its key, the
+# evaluation vector and its floats, and the list slot pointing at it)
+ENTRY_BYTES = 400
+
+# positions in an entry tuple
+ENTRY_KEY = 0
+ENTRY_DEPTH = 1
+ENTRY_VALUE = 2
+ENTRY_MOVE = 3
+ENTRY_FLAG = 4
+ENTRY_AGE = 5
+
+# what a stored value means: the exact value (always the case for maxn), or a
+# lower or upper bound left by an alpha-beta cutoff
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# a shared entry is a check word, a word of depth, flag, age and move, and
+# three words of evaluation (a single score only uses the first)
+SHARED_ENTRY = struct.Struct('<5Q')
+SHARED_DATA = struct.Struct('<Qddd')
+SHARED_ENTRY_BYTES = SHARED_ENTRY.size
+
+# bit positions in the second word of a shared entry
+DEPTH_BITS = 8
+FLAG_SHIFT = 8
+VECTOR_BIT = 1 << 10
+USED_BIT = 1 << 11
+AGE_SHIFT = 12
+AGE_MASK = 0xFFFF
+MOVE_SHIFT = 28
+
+# action names in the order they are numbered in a packed move; 0 is no move
+PACKED_ACTIONS = (None, "MOVE", "JUMP", "EXIT", "PASS")
+# hex index field value standing for None, and colour field value for a bare action
+NO_HEX = 63
+NO_COLOUR = 3
+
+
+# there are only a few thousand distinct actions, so packing is memoised
+@lru_cache(maxsize=None)
+def pack_move(move):
+    """
+    Packs an action tuple, or a (colour index, action) pair, into an integer.
+    :param move: the action or pair, or None
+    :return: a 23-bit integer
+    """
+    if move is None:
+        return 0
+    colour = NO_COLOUR
+    if len(move) == 2:
+        colour, move = move
+    packed = PACKED_ACTIONS.index(move[0]) | colour << 3
+    for shift, index in ((5, move[1]), (11, move[2]), (17, move[3])):
+        packed |= (NO_HEX if index is None else index) << shift
+    return packed
+
+
+@lru_cache(maxsize=None)
+def unpack_move(packed):
+    """
+    Reverses pack_move.
+    :param packed: the integer made by pack_move
+    :return: the action tuple or (colour index, action) pair, or None
+    """
+    action = PACKED_ACTIONS[packed & 7]
+    if action is None:
+        return None
+    indices = []
+    for shift in (5, 11, 17):
+        index = (packed >> shift) & NO_HEX
+        indices.append(None if index == NO_HEX else index)
+    move = (action, indices[0], indices[1], indices[2])
+    colour = (packed >> 3) & 3
+    if colour == NO_COLOUR:
+        return move
+    return (colour, move)
+
+
+def table_size(megabytes, entry_bytes):
+    """
+    Finds the largest power of two number of entries that fits in a memory cap.
+    :param megabytes: the most memory the table may use, in MB
+    :param entry_bytes: the size of one entry, in bytes
+    """
+    capacity = max(1, int(megabytes * 2 ** 20) // entry_bytes)
+    size = 1
+    while size * 2 <= capacity:
+        size *= 2
+    return size
+
+
+class TranspositionTable:
+    """
+    Stores (key, depth, value, best move, bound flag, age) entries by
+    position key. The value is an evaluation vector for maxn, or a single
+    score for the alpha-beta searches.
+    """
+    def __init__(self, megabytes=DEFAULT_TABLE_MEGABYTES):
+        """
+        :param megabytes: the most memory the table may use, in MB
+        """
+        size = table_size(megabytes, ENTRY_BYTES)
+        self.size = size
+        self.mask = size - 1
+        self.slots = [None] * size
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        """
+        Marks the start of a new search, so that entries from earlier
+        searches become the first to be replaced.
+        """
+        self.age += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        """
+        Looks up a position.
+        :param key: the position's 64-bit key (including the side to move)
+        :return: the stored entry tuple, or None if the position is not stored
+        """
+        self.probes += 1
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[ENTRY_KEY] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, value, move, flag=EXACT):
+        """
+        Records the result of searching a position.
+        :param key: the position's 64-bit key (including the side to move)
+        :param depth: the number of plies searched below the position
+        :param value: the evaluation found for the position
+        :param move: the best move found, or None
+        :param flag: whether the value is EXACT, a LOWER_BOUND or an UPPER_BOUND
+        """
+        slot = key & self.mask
+        entry = self.slots[slot]
+        if entry is None or entry[ENTRY_AGE] != self.age or entry[ENTRY_DEPTH] <= depth:
+            self.slots[slot] = (key, depth, value, move, flag, self.age)
+
+    def usage(self):
+        """
+        Finds the fraction of slots in use.
+        """
+        return sum(1 for entry in self.slots if entry is not None) / self.size
+
+
+def _release(memory, owner):
+    """
+    Closes a shared memory block, and frees it if this process created it.
+    """
+    memory.close()
+    if owner:
+        memory.unlink()
+
+
+class SharedTranspositionTable:
+    """
+    A TranspositionTable whose entries live in shared memory. The process
+    that creates it owns the block; worker processes either inherit it (when
+    forked) or attach to it by name (when it is pickled to them).
+    """
+    def __init__(self, megabytes=DEFAULT_TABLE_MEGABYTES, name=None):
+        """
+        :param megabytes: the most memory the table may use, in MB
+        :param name: the name of an existing table to attach to, or None to create one
+        """
+        self.megabytes = megabytes
+        self.size = table_size(megabytes, SHARED_ENTRY_BYTES)
+        self.mask = self.size - 1
+        owner = name is None
+        if owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=self.size * SHARED_ENTRY_BYTES)
+            self.memory.buf[:] = bytes(self.memory.size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            # only the owner may free the block, but attaching registers it
+            # with the resource tracker as if this process had created it
+            resource_tracker.unregister(self.memory._name, 'shared_memory')
+        self.buffer = self.memory.buf
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self._finalizer = weakref.finalize(self, _release, self.memory, owner)
+
+    def __getstate__(self):
+        return (self.megabytes, self.memory.name, self.age)
+
+    def __setstate__(self, state):
+        megabytes, name, age = state
+        self.__init__(megabytes, name)
+        self.age = age
+
+    def new_search(self):
+        """
+        Marks the start of a new search, so that entries from earlier
+        searches become the first to be replaced. Every process using the
+        table must agree on the age, so workers are given it by the parent.
+        """
+        self.age += 1
+
+    def clear(self):
+        self.buffer[:] = bytes(len(self.buffer))
+        self.probes = 0
+        self.hits = 0
+
+    def close(self):
+        """
+        Detaches from the shared memory, freeing it if this process created it.
+        """
+        self.buffer = None
+        self._finalizer()
+
+    def probe(self, key):
+        """
+        Looks up a position.
+        :param key: the position's 64-bit key (including the side to move)
+        :return: the stored entry tuple, or None if the position is not stored
+        or its entry was torn by a concurrent write
+        """
+        self.probes += 1
+        offset = (key & self.mask) * SHARED_ENTRY_BYTES
+        # copy the entry first, so the check and the decoded fields agree
+        raw = bytes(self.buffer[offset:offset + SHARED_ENTRY_BYTES])
+        check, info, first, second, third = SHARED_ENTRY.unpack(raw)
+        if not info & USED_BIT or check ^ info ^ first ^ second ^ third != key:
+            return None
+        self.hits += 1
+        values = SHARED_DATA.unpack_from(raw, 8)
+        value = list(values[1:]) if info & VECTOR_BIT else values[1]
+        return (key, info & (2 ** DEPTH_BITS - 1), value, unpack_move(info >> MOVE_SHIFT),
+                (info >> FLAG_SHIFT) & 3, (info >> AGE_SHIFT) & AGE_MASK)
+
+    def store(self, key, depth, value, move, flag=EXACT):
+        """
+        Records the result of searching a position.
+        :param key: the position's 64-bit key (including the side to move)
+        :param depth: the number of plies searched below the position
+        :param value: the evaluation found for the position
+        :param move: the best move found, or None
+        :param flag: whether the value is EXACT, a LOWER_BOUND or an UPPER_BOUND
+        """
+        offset = (key & self.mask) * SHARED_ENTRY_BYTES
+        age = self.age & AGE_MASK
+        old = SHARED_ENTRY.unpack_from(self.buffer, offset)[1]
+        if (old & USED_BIT and (old >> AGE_SHIFT) & AGE_MASK == age
+                and old & (2 ** DEPTH_BITS - 1) > depth):
+            return
+        info = depth | flag << FLAG_SHIFT | USED_BIT | age << AGE_SHIFT | pack_move(move) << MOVE_SHIFT
+        if isinstance(value, (int, float)):
+            data = SHARED_DATA.pack(info, value, 0.0, 0.0)
+        else:
+            data = SHARED_DATA.pack(info | VECTOR_BIT, *value)
+        words = SHARED_ENTRY.unpack(bytes(8) + data)
+        self.buffer[offset:offset + SHARED_ENTRY_BYTES] = SHARED_ENTRY.pack(
+            key ^ words[1] ^ words[2] ^ words[3] ^ words[4], *words[1:])
+
+    def usage(self):
+        """
+        Finds the fraction of slots in use.
+        """
+        return sum(1 for entry in SHARED_ENTRY.iter_unpack(self.buffer) if entry[1] & USED_BIT) / self.size
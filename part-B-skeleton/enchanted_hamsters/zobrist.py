@@ -0,0 +1,47 @@
+"""
+Zobrist keys for enchanted_hamsters positions.
+
+A position key is the XOR of one random 64-bit number per (hex, colour) of
+every piece on the board, one per (colour, exit count), and one for the
+colour to move. Boards keep the piece and exit part of their key up to date
+as pieces are placed, removed and converted; the side to move is mixed in
+when the key is used.
+
+The random numbers come from a fixed seed, so keys are the same in every
+process and every run (stored tables depend on this).
+"""
+import random
+
+from enchanted_hamsters.geometry import NUM_HEXES, PLAYER_LIST, WINNING_EXITS
+
+ZOBRIST_SEED = 30024
+
+_random = random.Random(ZOBRIST_SEED)
+
+PIECE_KEYS = [[_random.getrandbits(64) for index in range(NUM_HEXES)]
+              for colour in PLAYER_LIST]
+SIDE_KEYS = [_random.getrandbits(64) for colour in PLAYER_LIST]
+EXIT_KEYS = [[_random.getrandbits(64) for count in range(WINNING_EXITS + 1)]
+             for colour in PLAYER_LIST]
+
+
+def exit_key(exits):
+    """
+    Finds the part of a key that records how many exits each colour has made.
+    :param exits: the list of exits made by each colour
+    :return: the 64-bit key
+    """
+    key = 0
+    for colour, count in enumerate(exits):
+        key ^= EXIT_KEYS[colour][min(count, WINNING_EXITS)]
+    return key
+
+
+def exit_step_key(colour, count):
+    """
+    Finds the value to XOR into a key when a colour's exit count goes from
+    count to count + 1 (or back again).
+    :param colour: the colour index of the exiting player
+    :param count: the number of exits before the exit
+    """
+    return EXIT_KEYS[colour][min(count, WINNING_EXITS)] ^ EXIT_KEYS[colour][min(count + 1, WINNING_EXITS)]
@@ -0,0 +1 @@
+from mcts_hamsters.player import ExamplePlayer as Player
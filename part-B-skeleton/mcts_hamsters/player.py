@@ -0,0 +1,279 @@
+"""
+Monte Carlo Tree Search player.
+
+Builds a UCT tree below the current position for as long as the turn's time
+budget (or an iteration budget) allows. Every node keeps a reward vector with
+one entry per colour, and a node picks the child that is best for the player
+to move there, so the search needs no assumptions about how the three players
+treat each other.
+
+Below the tree, a playout plays fast random actions (exits are always taken,
+and captures and actions towards the exits are twice as likely as others) for
+a fixed number of plies. The final position is scored by the winner if the
+game ended, or otherwise by ranking the enchanted_hamsters evaluation of each
+colour. The board tracking, move generation and rules are all those of
+enchanted_hamsters.
+
+The tree is kept between turns: update() follows the actions actually played
+down from the last search's root, and the next search continues from the
+subtree it arrives at, if our search had expanded that far.
+"""
+import math
+import random
+import time
+
+import enchanted_hamsters.player as hamsters
+from enchanted_hamsters.geometry import EXIT_DISTANCES, HEX_INDEX
+
+# the most plies a playout runs before its position is scored
+PLAYOUT_DEPTH = 24
+
+# UCT exploration constant, for rewards between 0 and 1
+EXPLORATION = 0.7
+
+# room for every action of one colour, with weighted actions entered twice
+PLAYOUT_BUFFER = 256
+
+# value of the jumped field of a packed playout action that is not a jump
+NO_JUMP = 63
+
+# the reward vector of each colour winning
+WIN_REWARDS = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+
+
+class Node:
+    """
+    A position in the search tree, reached by one action from its parent.
+    """
+    __slots__ = ('move', 'parent', 'player', 'children', 'untried', 'visits', 'rewards')
+
+    def __init__(self, move, parent, player, untried):
+        """
+        :param move: the action tuple leading here from the parent, or None at the root
+        :param parent: the parent node, or None at the root
+        :param player: the colour index of the player to move here
+        :param untried: the actions not yet expanded into children (empty once the game is over)
+        """
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.rewards = [0.0, 0.0, 0.0]
+
+
+class ExamplePlayer(hamsters.ExamplePlayer):
+    # the most MCTS iterations per action, or None to stop only on time
+    ITERATIONS = None
+    # seed for the playouts, or None to seed from the system
+    SEED = None
+
+    def __init__(self, colour):
+        super().__init__(colour)
+        with self.clock:
+            self.random = random.Random(self.SEED)
+            # reused by every playout, so choosing an action builds no list
+            self.playout_moves = [0] * PLAYOUT_BUFFER
+            # statistics of the last search
+            self.iterations = 0
+            self.playouts = 0
+            self.search_seconds = 0.0
+            # the subtree for the current position, kept from the last search
+            self.tree = None
+
+    def action(self):
+        """
+        Chooses an action by Monte Carlo Tree Search, within the turn's time
+        budget.
+        """
+        with self.clock:
+            moves = self.generate_moves(self.board, self.colour_index)
+            critical = self.is_critical(self.board, self.colour_index, moves, self.numexits)
+            searched = self.mcts(self.clock.deadline(critical), self.ITERATIONS)
+        return self.format_move(searched)
+
+    def update(self, colour, action):
+        """
+        Updates the board, and moves the kept search tree down to the new
+        position.
+        """
+        super().update(colour, action)
+        with self.clock:
+            self.advance_tree(hamsters.PLAYER_LIST.index(colour), action)
+
+    def advance_tree(self, colour, action):
+        """
+        Re-roots the kept search tree on the child reached by an action, or
+        drops it if the search never expanded that action.
+        :param colour: the colour index of the player that took the action
+        :param action: the action in the referee's format
+        """
+        tree = self.tree
+        self.tree = None
+        if tree is None or tree.player != colour:
+            return
+        if action[0] == "PASS":
+            played = ("PASS", None, None)
+        elif action[0] == "EXIT":
+            played = ("EXIT", HEX_INDEX[tuple(action[1])], None)
+        else:
+            played = (action[0], HEX_INDEX[tuple(action[1][0])], HEX_INDEX[tuple(action[1][1])])
+        for child in tree.children:
+            if child.move[:3] == played:
+                # let the rest of the old tree be freed
+                child.parent = None
+                self.tree = child
+                return
+
+    def mcts(self, deadline, iterations=None):
+        """
+        Grows the search tree from the current position.
+        :param deadline: the process_time() value by which the search must stop
+        :param iterations: the most iterations to run, or None for no limit
+        :return: the action tuple of the most visited root child
+        """
+        me = self.colour_index
+        moves = self.generate_moves(self.board, me)
+        # there is nothing to search if only one action is available
+        if len(moves) == 1:
+            self.tree = None
+            return moves[0]
+        root = self.tree
+        if root is None or root.player != me:
+            root = Node(None, None, me, moves)
+        self.tree = root
+        start = time.process_time()
+        self.iterations = 0
+        self.playouts = 0
+        # the first iteration always runs, so there is always a move to play
+        while iterations is None or self.iterations < iterations:
+            self.iterate(root)
+            self.iterations += 1
+            if time.process_time() >= deadline:
+                break
+        self.search_seconds = time.process_time() - start
+        return max(root.children, key=lambda child: child.visits).move
+
+    def iterate(self, root):
+        """
+        Runs one MCTS iteration: selection, expansion, playout and backup.
+        :param root: the root node
+        """
+        state = self.board.copy()
+        exits = list(self.numexits)
+        node = root
+        # select down the tree while every action of a node has been tried
+        while not node.untried and node.children:
+            node = self.select(node)
+            self.make_move(state, node.parent.player, node.move, exits)
+        # expand one untried action
+        if node.untried:
+            move = node.untried.pop(self.random.randrange(len(node.untried)))
+            self.make_move(state, node.player, move, exits)
+            player = self.next_player(node.player)
+            untried = []
+            if max(exits) < hamsters.WINNING_EXITS:
+                untried = self.generate_moves(state, player)
+            child = Node(move, node, player, untried)
+            node.children.append(child)
+            node = child
+        rewards = self.playout(state, node.player, exits)
+        self.playouts += 1
+        # back the reward vector up to the root
+        while node is not None:
+            node.visits += 1
+            totals = node.rewards
+            totals[0] += rewards[0]
+            totals[1] += rewards[1]
+            totals[2] += rewards[2]
+            node = node.parent
+
+    def select(self, node):
+        """
+        Picks the child with the highest UCT value for the player to move.
+        :param node: a fully expanded node
+        :return: the child node
+        """
+        player = node.player
+        log_visits = math.log(node.visits)
+        best_child = None
+        best_value = -math.inf
+        for child in node.children:
+            value = (child.rewards[player] / child.visits
+                     + EXPLORATION * math.sqrt(log_visits / child.visits))
+            if value > best_value:
+                best_child = child
+                best_value = value
+        return best_child
+
+    def playout(self, state, player, exits):
+        """
+        Plays random actions from a position, then scores the result.
+        :param state: the board state, which is modified
+        :param player: the colour index of the player to move
+        :param exits: the list of exits made, which is modified
+        :return: the reward vector of the final position
+        """
+        rng = self.random
+        buffer = self.playout_moves
+        for ply in range(PLAYOUT_DEPTH):
+            if max(exits) >= hamsters.WINNING_EXITS:
+                break
+            # a piece that can exit always does
+            exiting = state.exits(player)
+            if exiting:
+                state.remove(exiting[0], player)
+                state.record_exit(player, exits[player])
+                exits[player] += 1
+                player = self.next_player(player)
+                continue
+            own = state.masks[player]
+            distances = EXIT_DISTANCES[player]
+            count = 0
+            for piece in state.pieces(player):
+                for target, jumped in self.can_move(state, piece):
+                    # pack the action into one int, so no tuple is built
+                    code = piece | target << 6 | (NO_JUMP if jumped is None else jumped) << 12
+                    buffer[count] = code
+                    count += 1
+                    # captures and actions towards the exits are twice as likely
+                    if ((jumped is not None and not (own >> jumped) & 1)
+                            or distances[target] < distances[piece]):
+                        buffer[count] = code
+                        count += 1
+            if count:
+                code = buffer[rng.randrange(count)]
+                state.remove(code & 63, player)
+                state.place(code >> 6 & 63, player)
+                if code >> 12 != NO_JUMP:
+                    self.jump_update(state, code >> 12, player)
+            player = self.next_player(player)
+        return self.rewards(state, exits)
+
+    def rewards(self, state, exits):
+        """
+        Scores a position for each colour: 1 for a win, or otherwise 1, 0.5
+        and 0 by the ranking of their evaluations (ties share the reward).
+        :param state: the board state
+        :param exits: the list of exits made
+        :return: the reward vector
+        """
+        for colour in range(len(hamsters.PLAYER_LIST)):
+            if exits[colour] >= hamsters.WINNING_EXITS:
+                return WIN_REWARDS[colour]
+        scores = self.evaluation(state, exits)
+        rewards = []
+        for score in scores:
+            below = sum(1 for other in scores if other < score)
+            tied = sum(1 for other in scores if other == score) - 1
+            rewards.append((below + 0.5 * tied) / 2)
+        return rewards
+
+    def playout_rate(self):
+        """
+        The number of playouts per CPU second in the last search.
+        """
+        if self.search_seconds == 0:
+            return 0.0
+        return self.playouts / self.search_seconds